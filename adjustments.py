@@ -0,0 +1,229 @@
+"""
+Image adjustments applied before quantization
+An ordered list of stages such as
+    [{'op': 'contrast', 'value': 1.2}, {'op': 'saturation', 'value': 1.5}, {'op': 'posterize', 'bits': 4}]
+runs on the downscaled image. Neighbouring point operations are fused into a
+single lookup table pass, and intermediate results are cached so that editing a
+late stage does not recompute the earlier ones.
+"""
+
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+# Point operations: per-channel functions of the value alone, fused into one LUT
+POINT_OPERATIONS = ('brightness', 'contrast', 'gamma', 'posterize')
+
+# Operations that look at neighbouring pixels or across channels
+IMAGE_OPERATIONS = ('saturation', 'sharpen', 'remove_background')
+
+ADJUSTMENT_OPERATIONS = POINT_OPERATIONS + IMAGE_OPERATIONS
+
+# Accepted gamma values; the curve uses 1/gamma, so zero and negative values are meaningless
+GAMMA_RANGE = (0.1, 10.0)
+
+# Stage parameters: (conversion the stage applies to it, lowest, highest accepted value)
+# None leaves that side open; gamma's 'value' is checked against GAMMA_RANGE
+STAGE_PARAMETERS = {
+    'value': (float, None, None),
+    'bits': (int, 1, 8),
+    'radius': (float, 0.0, 100.0),
+    'percent': (int, 0, 1000),
+    'threshold': (int, 0, 255),
+    'tolerance': (int, 0, 765),  # sum of three channel differences
+}
+
+# Intermediate results kept in memory (least recently used evicted first)
+ADJUSTMENT_CACHE_SIZE = 64
+
+def _point_curve(stage, values):
+    """Apply one point operation to float values in [0, 255]"""
+    op = stage['op']
+    if op == 'brightness':
+        result = values * float(stage.get('value', 1.0))
+    elif op == 'contrast':
+        result = (values - 128.0) * float(stage.get('value', 1.0)) + 128.0
+    elif op == 'gamma':
+        gamma = min(max(float(stage.get('value', 1.0)), GAMMA_RANGE[0]), GAMMA_RANGE[1])
+        result = 255.0 * (values / 255.0) ** (1.0 / gamma)
+    else:  # posterize
+        bits = min(8, max(1, int(stage.get('bits', 4))))
+        step = 1 << (8 - bits)
+        result = np.floor(np.rint(values) / step) * step
+    return np.clip(result, 0.0, 255.0)
+
+def build_point_lut(stages):
+    """Fuse a run of point operations into one 256-entry uint8 lookup table"""
+    values = np.arange(256, dtype=np.float64)
+    for stage in stages:
+        values = _point_curve(stage, values)
+    return np.rint(values).astype(np.uint8)
+
+def _saturation(pixels, alpha, stage):
+    factor = float(stage.get('value', 1.0))
+    gray = (pixels.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32))[..., None]
+    result = gray + (pixels - gray) * factor
+    return np.clip(np.rint(result), 0, 255).astype(np.uint8), alpha
+
+def _sharpen(pixels, alpha, stage):
+    unsharp = ImageFilter.UnsharpMask(
+        radius=float(stage.get('radius', 2)),
+        percent=int(stage.get('percent', 150)),
+        threshold=int(stage.get('threshold', 3))
+    )
+    return np.array(Image.fromarray(pixels).filter(unsharp)), alpha
+
+def _remove_background(pixels, alpha, stage):
+    """
+    Make the background transparent by flood-filling from the four corners
+
+    A pixel joins the background if it is connected to a corner through pixels
+    within `tolerance` (sum of absolute channel differences) of that corner's color.
+    """
+    tolerance = int(stage.get('tolerance', 32))
+    height, width = pixels.shape[:2]
+    background = np.zeros((height, width), dtype=bool)
+    signed = pixels.astype(np.int16)
+
+    for y, x in ((0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)):
+        if background[y, x]:
+            continue
+        similar = np.abs(signed - signed[y, x]).sum(axis=-1) <= tolerance
+        # Copy: images created from arrays share a read-only buffer
+        mask = Image.fromarray(np.where(similar, 255, 0).astype(np.uint8)).copy()
+        ImageDraw.floodfill(mask, (x, y), 128)
+        background |= np.array(mask) == 128
+
+    if alpha is None:
+        alpha = np.full((height, width), 255, dtype=np.uint8)
+    return pixels, np.where(background, 0, alpha).astype(np.uint8)
+
+_IMAGE_FUNCTIONS = {
+    'saturation': _saturation,
+    'sharpen': _sharpen,
+    'remove_background': _remove_background,
+}
+
+def validate_stages(stages):
+    """
+    Check that every stage names a known operation with usable parameters
+
+    Parameters are converted the same way the stage converts them (int() for
+    bits, percent, threshold and tolerance), so anything accepted here also
+    runs.
+
+    Raises:
+        ValueError: On an unknown or missing 'op', a parameter that does not
+            convert or is outside its STAGE_PARAMETERS range, or a gamma
+            outside GAMMA_RANGE
+    """
+    for stage in stages:
+        if not isinstance(stage, dict) or stage.get('op') not in ADJUSTMENT_OPERATIONS:
+            raise ValueError(f"Unknown adjustment stage: {stage}")
+        for name, (convert, low, high) in STAGE_PARAMETERS.items():
+            if name not in stage:
+                continue
+            kind = 'an integer' if convert is int else 'a number'
+            try:
+                value = convert(stage[name])
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f"Adjustment '{stage['op']}' needs {kind} for '{name}'")
+            if not math.isfinite(value):
+                raise ValueError(f"Adjustment '{stage['op']}' needs {kind} for '{name}'")
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise ValueError(f"Adjustment '{stage['op']}': '{name}' must be between {low} and {high}")
+        if stage['op'] == 'gamma':
+            gamma = float(stage.get('value', 1.0))
+            if not GAMMA_RANGE[0] <= gamma <= GAMMA_RANGE[1]:
+                raise ValueError(f"Gamma must be between {GAMMA_RANGE[0]} and {GAMMA_RANGE[1]}")
+
+def creates_alpha(stages):
+    """Whether the pipeline produces transparency of its own (background removal)"""
+    return any(stage.get('op') == 'remove_background' for stage in stages)
+
+def compile_steps(stages):
+    """
+    Group stages into executable steps
+
+    Returns:
+        List of (kind, payload, last_stage_position) where kind is 'lut' (payload
+        is the fused table) or an image operation name (payload is the stage)
+    """
+    steps = []
+    run = []
+    for position, stage in enumerate(stages):
+        if stage['op'] in POINT_OPERATIONS:
+            run.append(stage)
+            continue
+        if run:
+            steps.append(('lut', build_point_lut(run), position - 1))
+            run = []
+        steps.append((stage['op'], stage, position))
+    if run:
+        steps.append(('lut', build_point_lut(run), len(stages) - 1))
+    return steps
+
+class AdjustmentPipeline:
+    """Runs adjustment stages with a cache of intermediate results per source"""
+
+    def __init__(self, cache_size=ADJUSTMENT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_get(self, key):
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    def _cache_put(self, key, result):
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def run(self, source_key, pixels, alpha, stages):
+        """
+        Apply stages to a downscaled image
+
+        Args:
+            source_key: Hashable identity of the input (upload, size, kernel...);
+                None disables caching
+            pixels: (height, width, 3) uint8 RGB array
+            alpha: (height, width) uint8 array or None
+            stages: Ordered list of stage dicts
+
+        Returns:
+            (pixels, alpha) after all stages
+        """
+        validate_stages(stages)
+        steps = compile_steps(stages)
+        stage_keys = [json.dumps(stage, sort_keys=True) for stage in stages]
+
+        # Resume after the longest prefix of steps that is already cached
+        start = 0
+        if source_key is not None:
+            for step_number in range(len(steps), 0, -1):
+                last_stage = steps[step_number - 1][2]
+                cached = self._cache_get((source_key, tuple(stage_keys[:last_stage + 1])))
+                if cached is not None:
+                    pixels, alpha = cached
+                    start = step_number
+                    break
+
+        for kind, payload, last_stage in steps[start:]:
+            if kind == 'lut':
+                pixels = payload[pixels]
+            else:
+                pixels, alpha = _IMAGE_FUNCTIONS[kind](pixels, alpha, payload)
+            if source_key is not None:
+                self._cache_put((source_key, tuple(stage_keys[:last_stage + 1])), (pixels, alpha))
+
+        return pixels, alpha
@@ -15,6 +15,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from database import configure_sqlite, create_schema
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -35,10 +36,24 @@ app.config['PROCESSED_FOLDER'] = 'processed'
 app.config['SCRIPTS_FOLDER'] = 'scripts'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Resumable chunked uploads: larger originals arrive in chunks below MAX_CONTENT_LENGTH
+app.config['STAGING_FOLDER'] = 'upload_staging'
+app.config['UPLOAD_CHUNK_SIZE'] = 1024 * 1024
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_MB', 256)) * 1024 * 1024
+app.config['CHUNKED_UPLOAD_TTL'] = 24 * 3600  # seconds before an abandoned upload is discarded
+
+# Disk quota for uploads + processed outputs; unreferenced files beyond it are collected
+app.config['STORAGE_QUOTA_BYTES'] = int(os.environ.get('STORAGE_QUOTA_MB', 2048)) * 1024 * 1024
+app.config['STORAGE_GC_INTERVAL'] = int(os.environ.get('STORAGE_GC_INTERVAL', 600))  # seconds
+
+# Estimated peak memory one conversion may use; larger JPEGs decode at reduced scale, others are refused
+app.config['CONVERSION_MEMORY_BUDGET'] = int(os.environ.get('CONVERSION_MEMORY_BUDGET_MB', 512)) * 1024 * 1024
+
 # Create upload directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
 os.makedirs(app.config['SCRIPTS_FOLDER'], exist_ok=True)
+os.makedirs(app.config['STAGING_FOLDER'], exist_ok=True)
 
 # Configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///wplace_bot.db")
@@ -51,9 +66,12 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 db.init_app(app)
 
 with app.app_context():
+    # WAL, busy timeout and cache settings on every SQLite connection
+    configure_sqlite(db.engine)
+    
     # Import models and routes
     import models  # noqa: F401
     import routes  # noqa: F401
     
-    # Create tables
-    db.create_all()
+    # Create tables; create_all skips existing tables, so also add indexes introduced since they were created
+    create_schema(db, models.ImageUpload.__table__.indexes)
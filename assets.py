@@ -0,0 +1,83 @@
+"""
+Fingerprinted static assets
+Looks up the hashed copies written by build_assets.py and serves them with
+immutable cache headers, picking a precompressed sibling the client accepts
+"""
+
+import os
+import json
+import mimetypes
+from flask import url_for, send_from_directory, request, abort
+from werkzeug.security import safe_join
+
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Hashed names never change content, so browsers may keep them for a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Precompressed siblings, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+class AssetManifest:
+    """Maps static asset paths to their fingerprinted names in the dist folder"""
+
+    def __init__(self, static_folder):
+        self.dist_folder = os.path.join(static_folder, DIST_DIRNAME)
+        self.manifest_path = os.path.join(self.dist_folder, MANIFEST_NAME)
+        self._entries = {}
+        self._mtime = None
+
+    def lookup(self, filename):
+        """Fingerprinted name of an asset, or None if it has not been built"""
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            # Rebuilt since it was last read
+            try:
+                with open(self.manifest_path) as f:
+                    self._entries = json.load(f)
+                self._mtime = mtime
+            except (OSError, ValueError):
+                pass  # Unreadable right now: keep serving the previous entries and retry next time
+        return self._entries.get(filename)
+
+    def url(self, filename, endpoint):
+        """
+        URL of an asset for templates
+
+        Args:
+            filename: Path relative to the static folder, e.g. 'js/main.js'
+            endpoint: Endpoint serving the dist folder
+
+        Returns:
+            The fingerprinted URL, or the plain static URL when no build exists
+        """
+        name = self.lookup(filename)
+        if name is None:
+            return url_for('static', filename=filename)
+        return url_for(endpoint, filename=name)
+
+    def send(self, filename):
+        """Response for a fingerprinted asset, precompressed when the client accepts it"""
+        path = safe_join(self.dist_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+                response = send_from_directory(
+                    self.dist_folder, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.dist_folder, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Build the web UI's static assets for production
+Minifies the JS/CSS under static/, writes them to static/dist under
+content-hashed names with .gz (and .br, if the brotli module is installed)
+siblings, and records the mapping in static/dist/manifest.json for asset_url()
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+
+try:
+    import brotli
+except ImportError:  # Optional dependency, only needed for .br siblings
+    brotli = None
+
+from assets import DIST_DIRNAME, MANIFEST_NAME
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Assets served from the dist folder, relative to static/
+ASSETS = ['css/style.css', 'js/main.js', 'js/bot_control.js']
+
+HASH_LENGTH = 12
+
+# Files of this many recent builds stay in dist, so cached pages that still
+# reference an older build's hashed names keep working after a deploy
+KEEP_BUILDS = 5
+HISTORY_NAME = 'builds.json'
+
+# A '/' after one of these characters or keywords starts a regular expression literal rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORD = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|void|delete|throw|new)$')
+
+# An unquoted url(...) is a single CSS token: '/*' or quotes inside it are part of the URL
+_CSS_UNQUOTED_URL = re.compile(r'url\(\s*[^\s"\')][^)]*\)', re.IGNORECASE)
+
+def minify_js(source):
+    """
+    Conservatively minify JavaScript
+
+    Removes comments, indentation, blank lines and runs of spaces, but keeps
+    line breaks so automatic semicolon insertion behaves exactly as before.
+    Strings, template literals and regular expressions are copied unchanged.
+    """
+    out = []
+    i, n = 0, len(source)
+    template_depth = []  # brace depth at each ${ we are inside
+    braces = 0
+
+    def last_char():
+        return out[-1][-1] if out else '\n'
+
+    def space():
+        if last_char() not in ' \n':
+            out.append(' ')
+
+    def newline():
+        if out and out[-1] == ' ':
+            out.pop()
+        if last_char() != '\n':
+            out.append('\n')
+
+    def starts_regex():
+        tail = ''.join(out[-16:]).rstrip()
+        if tail.endswith(('++', '--')):
+            return False  # Postfix increment/decrement: what follows divides
+        return not tail or tail[-1] in _REGEX_PRECEDERS or _REGEX_KEYWORD.search(tail)
+
+    while i < n:
+        char = source[i]
+        if char in '\'"':
+            j = i + 1
+            while j < n and source[j] not in (char, '\n'):
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif char == '`' or (char == '}' and template_depth and template_depth[-1] == braces):
+            # Template literal text, up to its end or the next ${
+            if char == '}':
+                template_depth.pop()
+            j = i + 1
+            while j < n and source[j] != '`' and not source.startswith('${', j):
+                j += 2 if source[j] == '\\' else 1
+            if source.startswith('${', j):
+                template_depth.append(braces)
+                j += 2
+            else:
+                j += 1
+            out.append(source[i:j])
+            i = j
+        elif source.startswith('//', i):
+            while i < n and source[i] != '\n':
+                i += 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            space()
+        elif char == '/' and starts_regex():
+            j = i + 1
+            in_class = False
+            while j < n and source[j] != '\n':
+                if source[j] == '\\':
+                    j += 1
+                elif source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                elif source[j] == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and (source[j].isalnum() or source[j] == '_'):
+                j += 1  # flags
+            out.append(source[i:j])
+            i = j
+        elif char == '\n':
+            newline()
+            i += 1
+        elif char.isspace():
+            space()
+            i += 1
+        else:
+            if char == '{':
+                braces += 1
+            elif char == '}':
+                braces -= 1
+            out.append(char)
+            i += 1
+
+    return ''.join(out).strip() + '\n'
+
+def minify_css(source):
+    """
+    Conservatively minify CSS
+
+    Removes comments and collapses whitespace, dropping it only around
+    braces, semicolons and commas; quoted strings and unquoted url()
+    values are copied unchanged.
+    """
+    out = []
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+        if char in '\'"':
+            j = i + 1
+            while j < n and source[j] != char:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif char in 'uU' and _CSS_UNQUOTED_URL.match(source, i):
+            url = _CSS_UNQUOTED_URL.match(source, i).group()
+            out.append(url)
+            i += len(url)
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        elif char.isspace():
+            while i < n and source[i].isspace():
+                i += 1
+            out.append(' ')
+        else:
+            out.append(char)
+            i += 1
+
+    # Strings were copied whole, so split them back out before touching whitespace
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', ''.join(out))
+    for index in range(0, len(parts), 2):
+        parts[index] = re.sub(r'\s*([{};,])\s*', r'\1', parts[index]).replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+def hashed_name(path, content):
+    """style.css -> style.<hash>.css"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def _write(path, content):
+    """Write a file atomically, so a worker never serves it half-written"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+def _write_asset(path, content):
+    """Write a content-addressed file unless an earlier build already did"""
+    if not os.path.exists(path):
+        _write(path, content)
+
+def _load_history(dist_dir):
+    """Manifests of previous builds, oldest first"""
+    try:
+        with open(os.path.join(dist_dir, HISTORY_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _prune(dist_dir, history):
+    """Delete built files that none of the kept builds reference"""
+    keep = {MANIFEST_NAME, HISTORY_NAME}
+    for manifest in history:
+        for name in manifest.values():
+            keep.update(name + suffix for suffix in ('', '.gz', '.br'))
+    removed = 0
+    for directory, _, filenames in os.walk(dist_dir):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if os.path.relpath(path, dist_dir).replace(os.sep, '/') not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+def build(static_dir=STATIC_DIR, assets=ASSETS, minify=True, keep_builds=KEEP_BUILDS):
+    """
+    Build every asset into static_dir/dist and write the manifest
+
+    Hashed files of the last keep_builds builds are kept; older ones are
+    pruned. The manifest is replaced atomically, so workers reading it during
+    a build see either the old or the new one.
+
+    Args:
+        static_dir: Folder holding the source assets
+        assets: Asset paths relative to static_dir
+        minify: Minify JS/CSS (False copies them as they are)
+        keep_builds: Number of builds whose files stay in dist
+
+    Returns:
+        Manifest dictionary of source path -> hashed path (relative to dist)
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+
+    manifest = {}
+    for asset in assets:
+        with open(os.path.join(static_dir, asset), encoding='utf-8') as f:
+            source = f.read()
+        minifier = MINIFIERS.get(os.path.splitext(asset)[1])
+        content = (minifier(source) if minify and minifier else source).encode('utf-8')
+
+        name = hashed_name(asset, content)
+        target = os.path.join(dist_dir, name)
+        _write_asset(target, content)
+        # mtime=0 keeps the .gz byte-identical between builds of the same content
+        _write_asset(target + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write_asset(target + '.br', brotli.compress(content, quality=11))
+        manifest[asset] = name
+
+    history = _load_history(dist_dir)
+    if not history or history[-1] != manifest:
+        history.append(manifest)
+    history = history[-keep_builds:]
+
+    _write(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _write(os.path.join(dist_dir, HISTORY_NAME), json.dumps(history, indent=2).encode('utf-8'))
+    _prune(dist_dir, history)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument('--static-dir', default=STATIC_DIR, help="Folder holding the source assets")
+    parser.add_argument('--no-minify', action='store_true', help="Copy JS/CSS without minifying")
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir, minify=not args.no_minify)
+    dist_dir = os.path.join(args.static_dir, DIST_DIRNAME)
+    print(f"📦 Built {len(manifest)} assets into {dist_dir}")
+    for asset, name in manifest.items():
+        sizes = [os.path.getsize(os.path.join(args.static_dir, asset))]
+        for suffix in ('', '.gz', '.br'):
+            path = os.path.join(dist_dir, name + suffix)
+            if os.path.exists(path):
+                sizes.append(os.path.getsize(path))
+        print(f"   {asset:<20} -> {name:<32} " + " / ".join(f"{size:,}" for size in sizes) + " bytes")
+    if brotli is None:
+        print("⚠️  brotli module not installed, skipped .br files")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Staging files for resumable chunked uploads
+Chunks are appended straight to one file per upload while a running SHA-256
+of the contents is kept in memory, so finalizing does not re-read the file.
+Each staging file is flock()ed while it is checked and written, so chunks
+retried into different worker processes cannot both be appended.
+"""
+
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, where the app runs as a single process anyway
+    fcntl = None
+
+# Hash states kept in memory; other workers (or a restart) fall back to re-reading the file
+MAX_HASH_STATES = 256
+
+class ChunkOffsetError(Exception):
+    """A chunk does not start where the staged data ends"""
+    def __init__(self, expected):
+        super().__init__(f"Expected chunk at offset {expected}")
+        self.expected = expected
+
+class ChunkChecksumError(Exception):
+    """A chunk's contents do not match the checksum sent with it"""
+
+class ChunkStaging:
+    """Staging files of in-progress chunked uploads, keyed by upload id"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._hashes = {}  # upload_id -> (size hashed so far, sha256 object)
+        self._lock = threading.Lock()
+
+    def path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.part")
+
+    def create(self, upload_id):
+        """Start an empty staging file"""
+        open(self.path(upload_id), 'wb').close()
+        with self._lock:
+            self._hashes[upload_id] = (0, hashlib.sha256())
+
+    @contextmanager
+    def _locked(self, upload_id):
+        """
+        Open an upload's staging file for appending, exclusively locked across processes
+
+        Raises:
+            FileNotFoundError: If the staging file is gone (released by another request)
+        """
+        path = self.path(upload_id)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND)  # No O_CREAT: never revive a released upload
+        with os.fdopen(fd, 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            # The lock may have been waited for while another process moved the file away
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is None or not os.path.samestat(os.fstat(f.fileno()), current):
+                raise FileNotFoundError(f"Staging file of upload {upload_id} was released")
+            yield f
+
+    def size(self, upload_id):
+        """Bytes staged so far (0 if the staging file is gone)"""
+        try:
+            return os.path.getsize(self.path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, upload_id, offset, data, checksum=None):
+        """
+        Append one chunk to an upload's staging file
+
+        Args:
+            upload_id: Upload the chunk belongs to
+            offset: Position of the chunk in the file
+            data: Chunk contents
+            checksum: Hex SHA-256 of the chunk, checked before anything is written
+
+        Returns:
+            Staged size after the chunk
+
+        Raises:
+            ChunkChecksumError: If the checksum does not match
+            ChunkOffsetError: If offset is not the current staged size; a chunk
+                that was already fully received is accepted again unchanged
+            FileNotFoundError: If the upload was finalized or discarded meanwhile
+        """
+        if checksum and hashlib.sha256(data).hexdigest() != checksum.lower():
+            raise ChunkChecksumError("Chunk checksum mismatch")
+
+        with self._locked(upload_id) as f:
+            staged = os.fstat(f.fileno()).st_size
+            if offset != staged:
+                if offset + len(data) <= staged:
+                    return staged  # Retried chunk whose response was lost
+                raise ChunkOffsetError(staged)
+
+            f.write(data)
+            f.flush()
+
+            with self._lock:
+                state = self._hashes.get(upload_id)
+                if state and state[0] == offset:
+                    state[1].update(data)
+                    self._hashes[upload_id] = (offset + len(data), state[1])
+                else:
+                    self._hashes.pop(upload_id, None)
+                if len(self._hashes) > MAX_HASH_STATES:
+                    self._hashes.pop(next(iter(self._hashes)))
+            return offset + len(data)
+
+    def digest(self, upload_id):
+        """Hex SHA-256 of the staged file, from the running hash when this worker has it"""
+        size = self.size(upload_id)
+        with self._lock:
+            state = self._hashes.get(upload_id)
+            if state and state[0] == size:
+                return state[1].hexdigest()
+
+        sha256 = hashlib.sha256()
+        with open(self.path(upload_id), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def release(self, upload_id, destination=None):
+        """
+        Finish with a staging file, moving it to destination or deleting it
+
+        Waits for a chunk being appended in another process to finish first.
+
+        Raises:
+            FileNotFoundError: If moving to destination but the staging file is
+                already gone; deleting a missing file is not an error
+        """
+        with self._lock:
+            self._hashes.pop(upload_id, None)
+        path = self.path(upload_id)
+        try:
+            with self._locked(upload_id):
+                if destination:
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    os.replace(path, destination)
+                else:
+                    os.remove(path)
+        except FileNotFoundError:
+            if destination:
+                raise
+
+    def restore(self, upload_id, source):
+        """Move a file released to source back into staging, undoing release(upload_id, source)"""
+        os.replace(source, self.path(upload_id))
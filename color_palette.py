@@ -3,6 +3,12 @@ Wplace.live official 64-color palette mapping
 Based on web search results about wplace.live color system
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
 # Official Wplace.live 64-color palette (hex values)
 WPLACE_PALETTE = [
     # Free colors (basic palette)
@@ -30,6 +36,10 @@ WPLACE_PALETTE = [
 FREE_COLORS = WPLACE_PALETTE[:32]  # First 32 colors are free
 PREMIUM_COLORS = WPLACE_PALETTE[32:]  # Last 32 colors are premium
 
+# Largest saved palette. Plan grids reserve the top index value for transparent
+# cells, and matching cost grows with every color, so keep far below uint16
+MAX_PALETTE_COLORS = 256
+
 def rgb_to_hex(rgb):
     """Convert RGB tuple to hex string"""
     return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
@@ -86,6 +96,426 @@ def find_closest_color(target_rgb, allowed_colors=None):
     
     return closest_color
 
+def palette_to_array(allowed_colors):
+    """Convert a list of hex colors to an (N, 3) int32 RGB array"""
+    return np.array([hex_to_rgb(color) for color in allowed_colors], dtype=np.int32).reshape(-1, 3)
+
+def pack_rgb(pixels):
+    """Pack an (..., 3) RGB array into (...) uint32 keys"""
+    pixels = np.asarray(pixels, dtype=np.uint32)
+    return (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+
+def unpack_rgb(keys):
+    """Inverse of pack_rgb, returns an (..., 3) int32 array"""
+    keys = np.asarray(keys, dtype=np.uint32)
+    return np.stack([(keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF], axis=-1).astype(np.int32)
+
+# Color matching metrics supported by ColorLUT
+COLOR_METRICS = ('rgb', 'lab')
+
+# Upper bound on colors remembered by a single ColorLUT
+MAX_LUT_ENTRIES = 1 << 20
+
+# Matching engine thresholds: below DIRECT_MAX_PAIRS (pixels x palette colors)
+# pixels are matched directly; palettes of TREE_MIN_COLORS or more are searched
+# with a KD-tree instead of a full distance matrix
+DIRECT_MAX_PAIRS = 1 << 16
+TREE_MIN_COLORS = 128
+BRUTE_CHUNK_PAIRS = 1 << 22
+
+# Compiled palettes kept in memory, keyed by content hash (least recently used evicted first)
+MAX_COMPILED_PALETTES = 32
+_compiled_palettes = OrderedDict()
+_compiled_lock = threading.Lock()
+
+def rgb_to_lab(pixels):
+    """
+    Convert an (..., 3) sRGB array (0-255) to CIE L*a*b* (D65)
+    
+    Returns:
+        float64 array of the same shape
+    """
+    rgb = np.asarray(pixels, dtype=np.float64) / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+def brute_force_nearest(points, palette_points):
+    """
+    Index of the nearest palette point for every point, by full distance matrix
+    
+    Points are processed in chunks to bound the size of the distance matrix.
+    Ties go to the lowest palette index.
+    """
+    chunk = max(1, BRUTE_CHUNK_PAIRS // max(1, len(palette_points)))
+    result = np.empty(len(points), dtype=np.intp)
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        distances = ((block[:, None, :] - palette_points[None, :, :]) ** 2).sum(axis=-1)
+        result[start:start + chunk] = distances.argmin(axis=1)
+    return result
+
+class PaletteKDTree:
+    """
+    KD-tree over palette points for batched nearest-color queries
+    
+    Leaves hold up to leaf_size palette points and their bounding box. A batch
+    of queries first descends to its home leaves, then only visits the other
+    leaves whose bounding box is closer than the best match found so far.
+    Results are identical to brute_force_nearest, ties included.
+    """
+    
+    def __init__(self, palette_points, leaf_size=8):
+        self.points = np.asarray(palette_points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        # Internal nodes: split dimension/value and children; leaf nodes: leaf id (-1 for internal)
+        self.split_dim = []
+        self.split_value = []
+        self.children = []
+        self.node_leaf = []
+        self.leaves = []
+        self._build(np.arange(len(self.points)))
+        
+        self.split_dim = np.array(self.split_dim, dtype=np.intp)
+        self.split_value = np.array(self.split_value, dtype=np.float64)
+        self.children = np.array(self.children, dtype=np.intp).reshape(-1, 2)
+        self.node_leaf = np.array(self.node_leaf, dtype=np.intp)
+        self.leaf_low = np.array([self.points[leaf].min(axis=0) for leaf in self.leaves])
+        self.leaf_high = np.array([self.points[leaf].max(axis=0) for leaf in self.leaves])
+    
+    def _build(self, members):
+        node = len(self.node_leaf)
+        self.split_dim.append(0)
+        self.split_value.append(0.0)
+        self.children.append((0, 0))
+        self.node_leaf.append(-1)
+        
+        spread = self.points[members].max(axis=0) - self.points[members].min(axis=0)
+        if len(members) <= self.leaf_size or not spread.any():
+            self.node_leaf[node] = len(self.leaves)
+            self.leaves.append(np.sort(members))
+            return node
+        
+        # Split on the widest dimension at the median
+        dim = int(spread.argmax())
+        order = members[np.argsort(self.points[members, dim], kind='stable')]
+        middle = len(order) // 2
+        self.split_dim[node] = dim
+        self.split_value[node] = self.points[order[middle - 1], dim]
+        left = self._build(order[:middle])
+        right = self._build(order[middle:])
+        self.children[node] = (left, right)
+        return node
+    
+    def _update(self, points, rows, leaf, best_distance, best_index):
+        """Compare points[rows] against one leaf, keeping the lowest (distance, index)"""
+        members = self.leaves[leaf]
+        distances = ((points[rows][:, None, :] - self.points[members][None, :, :]) ** 2).sum(axis=-1)
+        position = distances.argmin(axis=1)
+        distance = distances[np.arange(len(rows)), position]
+        index = members[position]
+        better = (distance < best_distance[rows]) | ((distance == best_distance[rows]) & (index < best_index[rows]))
+        best_distance[rows[better]] = distance[better]
+        best_index[rows[better]] = index[better]
+    
+    def query(self, points):
+        """
+        Nearest palette point for every query point
+        
+        Args:
+            points: (N, D) array in the same space as the palette points
+        
+        Returns:
+            (N,) array of palette indices
+        """
+        points = np.asarray(points, dtype=np.float64)
+        count = len(points)
+        best_distance = np.full(count, np.inf)
+        best_index = np.full(count, len(self.points), dtype=np.intp)
+        
+        # Descend all queries to their home leaf
+        node = np.zeros(count, dtype=np.intp)
+        internal = self.node_leaf[node] < 0
+        while internal.any():
+            rows = np.nonzero(internal)[0]
+            current = node[rows]
+            go_right = points[rows, self.split_dim[current]] > self.split_value[current]
+            node[rows] = self.children[current, go_right.astype(np.intp)]
+            internal = self.node_leaf[node] < 0
+        home = self.node_leaf[node]
+        
+        for leaf in np.unique(home):
+            self._update(points, np.nonzero(home == leaf)[0], leaf, best_distance, best_index)
+        
+        # Visit other leaves only where their bounding box could hold a closer (or tied) point
+        for leaf in range(len(self.leaves)):
+            gap = np.maximum(self.leaf_low[leaf] - points, 0) + np.maximum(points - self.leaf_high[leaf], 0)
+            rows = np.nonzero(((gap ** 2).sum(axis=1) <= best_distance) & (home != leaf))[0]
+            if rows.size:
+                self._update(points, rows, leaf, best_distance, best_index)
+        
+        return best_index
+
+def nearest_indices(points, palette_points, tree=None):
+    """Nearest palette index per point, using the KD-tree when one is given"""
+    if tree is not None:
+        return tree.query(points)
+    return brute_force_nearest(points, palette_points)
+
+class ColorLUT:
+    """
+    Memoized RGB -> palette index mapping
+    
+    Each distinct color is matched against the palette once; later lookups of
+    that color, in the same image or another frame, are a binary search. The
+    'rgb' metric matches find_closest_color exactly (Euclidean RGB, first color
+    wins ties); 'lab' uses Euclidean distance in CIE L*a*b* (Delta E 1976).
+    """
+    
+    def __init__(self, allowed_colors=None, metric='rgb'):
+        if metric not in COLOR_METRICS:
+            raise ValueError(f"Unknown color metric: {metric}")
+        self.colors = list(allowed_colors) if allowed_colors is not None else list(WPLACE_PALETTE)
+        self.palette = palette_to_array(self.colors)
+        self.metric = metric
+        self._space = rgb_to_lab(self.palette) if metric == 'lab' else self.palette
+        self.tree = PaletteKDTree(self._space) if len(self.colors) >= TREE_MIN_COLORS else None
+        # (sorted keys, palette indices), replaced as a whole so readers always see a consistent pair
+        self._table = (np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.intp))
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._table[0])
+    
+    def add(self, pixels):
+        """
+        Match every color in pixels that is not in the table yet
+        
+        Returns:
+            The (keys, indices) table containing all colors of pixels
+        """
+        keys = np.unique(pack_rgb(pixels))
+        with self._lock:
+            table_keys, table_indices = self._table
+            if len(table_keys) + len(keys) > MAX_LUT_ENTRIES:
+                # Shared tables live as long as their palette; start over instead of growing forever
+                table_keys, table_indices = self._table = (np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.intp))
+            
+            new_keys = np.setdiff1d(keys, table_keys, assume_unique=True)
+            if new_keys.size == 0:
+                return self._table
+            
+            rgb = unpack_rgb(new_keys)
+            points = rgb_to_lab(rgb) if self.metric == 'lab' else rgb
+            new_indices = nearest_indices(points, self._space, self.tree)
+            
+            all_keys = np.concatenate([table_keys, new_keys])
+            order = np.argsort(all_keys, kind='stable')
+            self._table = (all_keys[order], np.concatenate([table_indices, new_indices])[order])
+            return self._table
+    
+    def lookup(self, pixels):
+        """
+        Map an (..., 3) RGB array to palette indices
+        
+        Returns:
+            Integer array of shape pixels.shape[:-1] indexing into self.colors
+        """
+        table_keys, table_indices = self.add(pixels)
+        positions = np.searchsorted(table_keys, pack_rgb(pixels))
+        return table_indices[positions]
+
+class CompiledPalette:
+    """
+    Matching structures for one palette, built once and shared between conversions
+    
+    Holds the palette as RGB and Lab arrays plus one ColorLUT per metric; the
+    LUTs keep every color they have matched, so repeat conversions with the
+    same palette mostly skip the distance computation.
+    """
+    
+    def __init__(self, colors, content_hash):
+        self.colors = list(colors)
+        self.content_hash = content_hash
+        self.rgb = palette_to_array(self.colors)
+        self.lab = rgb_to_lab(self.rgb)
+        self._luts = {}
+        self._lock = threading.Lock()
+    
+    def lut(self, metric='rgb'):
+        """Shared ColorLUT for the given metric"""
+        with self._lock:
+            if metric not in self._luts:
+                self._luts[metric] = ColorLUT(self.colors, metric)
+            return self._luts[metric]
+    
+    def engine(self, pixel_count):
+        """
+        Choose a matching engine for an image of pixel_count pixels
+        
+        'brute' matches every pixel directly (small images, where building and
+        searching the LUT costs more than it saves); 'tree' and 'lut' both go
+        through the shared ColorLUT, resolving new colors with the KD-tree for
+        large palettes and a distance matrix otherwise.
+        """
+        if pixel_count * len(self.colors) <= DIRECT_MAX_PAIRS:
+            return 'brute'
+        return 'tree' if len(self.colors) >= TREE_MIN_COLORS else 'lut'
+    
+    def match(self, pixels, metric='rgb', engine=None):
+        """
+        Map an (..., 3) RGB array to indices into self.colors
+        
+        Args:
+            pixels: RGB pixel array
+            metric: 'rgb' or 'lab'
+            engine: Force 'brute', 'lut' or 'tree' (None to choose by size)
+        """
+        pixels = np.asarray(pixels)
+        engine = engine or self.engine(pixels.size // 3)
+        if engine == 'brute':
+            flat = pixels.reshape(-1, 3).astype(np.int32)
+            if metric == 'lab':
+                indices = brute_force_nearest(rgb_to_lab(flat), self.lab)
+            else:
+                indices = brute_force_nearest(flat, self.rgb)
+            return indices.reshape(pixels.shape[:-1])
+        return self.lut(metric).lookup(pixels)
+
+def palette_hash(colors):
+    """Content hash of a palette (order matters: plans store indices into it)"""
+    return hashlib.sha256(','.join(colors).upper().encode('ascii')).hexdigest()
+
+def compile_palette(colors):
+    """
+    Get the compiled matching structures for a palette, building them on first use
+    
+    Compiled palettes are cached by content hash, so editing a palette's colors
+    naturally maps it to a new entry.
+    """
+    content_hash = palette_hash(colors)
+    with _compiled_lock:
+        compiled = _compiled_palettes.get(content_hash)
+        if compiled is not None:
+            _compiled_palettes.move_to_end(content_hash)
+            return compiled
+    
+    compiled = CompiledPalette(colors, content_hash)
+    with _compiled_lock:
+        compiled = _compiled_palettes.setdefault(content_hash, compiled)
+        _compiled_palettes.move_to_end(content_hash)
+        while len(_compiled_palettes) > MAX_COMPILED_PALETTES:
+            _compiled_palettes.popitem(last=False)
+    return compiled
+
+def invalidate_compiled_palette(content_hash):
+    """Drop a compiled palette from the cache (after a palette is edited or deleted)"""
+    with _compiled_lock:
+        _compiled_palettes.pop(content_hash, None)
+
+def normalize_hex_color(value):
+    """
+    Validate a hex color and normalize it to '#RRGGBB'
+    
+    Raises:
+        ValueError: If value is not a 3 or 6 digit hex color
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid hex color: {value!r}")
+    hex_color = value.strip().lstrip('#')
+    if len(hex_color) == 3:
+        hex_color = ''.join(c * 2 for c in hex_color)
+    if len(hex_color) != 6 or any(c not in '0123456789abcdefABCDEF' for c in hex_color):
+        raise ValueError(f"Invalid hex color: {value}")
+    return '#' + hex_color.upper()
+
+def normalize_palette_colors(colors):
+    """
+    Validate a palette's color list and normalize every color to '#RRGGBB'
+    
+    Raises:
+        ValueError: If colors is not a list of 1 to MAX_PALETTE_COLORS hex colors
+    """
+    if not isinstance(colors, list):
+        raise ValueError('Palette colors must be a list of hex colors')
+    if not 1 <= len(colors) <= MAX_PALETTE_COLORS:
+        raise ValueError(f'A palette needs between 1 and {MAX_PALETTE_COLORS} colors')
+    return [normalize_hex_color(color) for color in colors]
+
+def color_histogram(pixels, bits=5):
+    """
+    Histogram of an image's colors, reduced to `bits` bits per channel
+    
+    Args:
+        pixels: (..., 3) RGB array
+        bits: Precision per channel (5 bits = 32768 bins)
+    
+    Returns:
+        (colors, counts): bin center RGB values as an (K, 3) int32 array and
+        the number of pixels in each of the K non-empty bins
+    """
+    shift = 8 - bits
+    mask = (1 << bits) - 1
+    reduced = np.asarray(pixels, dtype=np.uint32).reshape(-1, 3) >> shift
+    keys = (reduced[:, 0] << (2 * bits)) | (reduced[:, 1] << bits) | reduced[:, 2]
+    counts = np.bincount(keys, minlength=1 << (3 * bits))
+    bins = np.nonzero(counts)[0]
+    
+    centers = np.stack([(bins >> (2 * bits)) & mask, (bins >> bits) & mask, bins & mask], axis=-1)
+    centers = (centers << shift) + ((1 << shift) >> 1)
+    return centers.astype(np.int32), counts[bins]
+
+def select_palette_subset(pixels, n_colors, allowed_colors=None, metric='rgb'):
+    """
+    Pick the n_colors palette entries that best represent an image
+    
+    Works on the image's color histogram rather than on every pixel: colors are
+    added greedily, each time choosing the palette entry that most reduces the
+    pixel-weighted squared distance from every histogram bin to its nearest
+    chosen color.
+    
+    Args:
+        pixels: (..., 3) RGB array of the image
+        n_colors: Number of colors to keep
+        allowed_colors: List of hex colors to choose from (defaults to full palette)
+        metric: 'rgb' or 'lab', as in ColorLUT
+    
+    Returns:
+        List of hex colors, in palette order
+    """
+    if allowed_colors is None:
+        allowed_colors = WPLACE_PALETTE
+    if n_colors >= len(allowed_colors):
+        return list(allowed_colors)
+    
+    colors, counts = color_histogram(pixels)
+    palette = palette_to_array(allowed_colors)
+    if metric == 'lab':
+        colors, palette = rgb_to_lab(colors), rgb_to_lab(palette)
+    distances = ((colors[:, None, :] - palette[None, :, :]) ** 2).sum(axis=-1).astype(np.float32)
+    weights = counts.astype(np.float32)
+    
+    chosen = []
+    nearest = np.full(len(colors), np.inf, dtype=np.float32)
+    for _ in range(max(1, n_colors)):
+        costs = weights @ np.minimum(nearest[:, None], distances)
+        costs[chosen] = np.inf
+        best = int(costs.argmin())
+        chosen.append(best)
+        nearest = np.minimum(nearest, distances[:, best])
+    
+    return [allowed_colors[i] for i in sorted(chosen)]
+
 def get_color_info(hex_color):
     """Get information about a color in the wplace palette"""
     if hex_color in FREE_COLORS:
@@ -125,3 +555,25 @@ def create_color_palette_json():
             for i, color in enumerate(PREMIUM_COLORS)
         ]
     }
+
+def create_custom_palette_json(name, colors):
+    """
+    Create a JSON representation of a saved palette for frontend
+    
+    Raises:
+        ValueError: If colors is not a valid palette (see normalize_palette_colors)
+    """
+    colors = normalize_palette_colors(colors)
+    return {
+        'name': name,
+        'custom_colors': [
+            {
+                'hex': color,
+                'rgb': hex_to_rgb(color),
+                'index': i
+            }
+            for i, color in enumerate(colors)
+        ],
+        'free_colors': [],
+        'premium_colors': []
+    }
@@ -0,0 +1,103 @@
+"""
+Database setup
+Connection tuning for the default SQLite database and short, retried write
+transactions so several gunicorn workers can share it without lock stalls
+"""
+
+import time
+import logging
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),        # Readers no longer block the writer (persistent per database file)
+    ('synchronous', 'NORMAL'),      # Safe with WAL; fsync at checkpoints instead of every commit
+    ('busy_timeout', 5000),         # Wait up to 5 s for a lock instead of failing at once
+    ('mmap_size', 268435456),       # Read pages through a 256 MB memory map
+    ('cache_size', -65536),         # 64 MB page cache per connection (negative = KiB)
+    ('temp_store', 'MEMORY'),
+)
+
+# Write retries for the rare busy errors busy_timeout cannot absorb
+# (e.g. a read transaction that has to be upgraded after another worker wrote)
+WRITE_ATTEMPTS = 5
+WRITE_BACKOFF = 0.05  # seconds, doubled after each attempt
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def configure_sqlite(engine):
+    """Tune every connection the engine opens; does nothing for other databases"""
+    if engine.dialect.name != 'sqlite':
+        return
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message or 'busy' in message
+
+def create_schema(db, indexes=(), attempts=WRITE_ATTEMPTS):
+    """
+    Create missing tables, then the given indexes on tables that already existed
+
+    Every gunicorn worker runs this at boot, so on a fresh database they race;
+    the loser gets 'already exists' or a lock error and retries, by which time
+    checkfirst sees the winner's tables.
+    """
+    for attempt in range(attempts):
+        try:
+            db.create_all()
+            for index in indexes:
+                index.create(db.engine, checkfirst=True)
+            return
+        except OperationalError as e:
+            if not ('already exists' in str(e) or is_lock_error(e)) or attempt == attempts - 1:
+                raise
+            time.sleep(WRITE_BACKOFF * (2 ** attempt))
+
+def commit_with_retry(session, apply, attempts=WRITE_ATTEMPTS, backoff=WRITE_BACKOFF):
+    """
+    Stage changes and commit them as one short transaction, retrying while the database is locked
+
+    Args:
+        session: SQLAlchemy session
+        apply: Callable that stages the changes on the session; it is re-run
+            after every rollback, since a rollback discards staged changes
+        attempts: Total number of tries before the lock error is raised
+        backoff: Initial delay between tries in seconds
+    """
+    for attempt in range(attempts):
+        apply()
+        try:
+            session.commit()
+            return
+        except OperationalError as e:
+            session.rollback()
+            if not is_lock_error(e) or attempt == attempts - 1:
+                raise
+            logging.warning(f"Database locked, retrying write ({attempt + 1}/{attempts})")
+            time.sleep(backoff * (2 ** attempt))
+
+def save_row(session, instance, **values):
+    """
+    Set column values on a model instance (adding it if new) and commit with retry
+
+    Keep expensive work (image processing, file I/O) outside this call so the
+    write lock is only held for the UPDATE/INSERT itself.
+
+    Returns:
+        The instance
+    """
+    def apply():
+        for name, value in values.items():
+            setattr(instance, name, value)
+        session.add(instance)
+
+    commit_with_retry(session, apply)
+    return instance
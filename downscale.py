@@ -0,0 +1,189 @@
+"""
+Downscaling kernels for pixel art conversion
+Block-based kernels crop the source to a whole number of blocks and reduce each
+block in place, so every output pixel is computed from the source pixels it covers
+"""
+
+import numpy as np
+from PIL import Image
+
+# Available downscale kernels ('lanczos' is the original PIL resize)
+DOWNSCALE_METHODS = ('lanczos', 'box', 'mode', 'median')
+
+# sRGB -> linear light lookup table for 8-bit values
+_SRGB_TO_LINEAR = np.where(
+    np.arange(256) / 255.0 <= 0.04045,
+    np.arange(256) / 255.0 / 12.92,
+    ((np.arange(256) / 255.0 + 0.055) / 1.055) ** 2.4
+).astype(np.float32)
+
+# The same table scaled to uint16, so block sums stay in integers
+_SRGB_TO_LINEAR_16 = np.rint(_SRGB_TO_LINEAR * 65535).astype(np.uint16)
+
+# Block kernels crop at most this fraction of an axis to make the blocks tile it;
+# past that (reductions under about 10x) the axis is stretched instead
+MAX_CROP_FRACTION = 0.1
+
+def fit_size(width, height, max_width, max_height):
+    """
+    Compute the output size that fits within max dimensions while keeping the aspect ratio
+
+    Returns:
+        (width, height) tuple; the original size if it already fits
+    """
+    if width <= max_width and height <= max_height:
+        return width, height
+
+    aspect_ratio = width / height
+    if aspect_ratio > 1:  # Wider than tall
+        new_width = min(max_width, width)
+        new_height = int(new_width / aspect_ratio)
+    else:  # Taller than wide
+        new_height = min(max_height, height)
+        new_width = int(new_height * aspect_ratio)
+
+    return max(1, new_width), max(1, new_height)
+
+def srgb_to_linear(pixels):
+    """Convert uint8 sRGB values to float32 linear light in [0, 1]"""
+    return _SRGB_TO_LINEAR[pixels]
+
+def linear_to_srgb(values):
+    """Convert linear light values in [0, 1] back to uint8 sRGB"""
+    values = np.clip(values, 0.0, 1.0)
+    srgb = np.where(values <= 0.0031308, values * 12.92, 1.055 * np.power(values, 1 / 2.4) - 0.055)
+    return np.rint(srgb * 255).astype(np.uint8)
+
+def _block_layout(length, count):
+    """
+    Block size along one axis and the source indices that tile it exactly
+
+    Returns:
+        (block, index) where index is a slice cropping the centered multiple of
+        the block size, or an index array stretching the axis when a crop
+        would drop more than MAX_CROP_FRACTION of it
+    """
+    block = length // count
+    spare = length - block * count
+    if block and spare <= MAX_CROP_FRACTION * length:
+        start = spare // 2
+        return block, slice(start, start + block * count)
+    block += 1
+    return block, np.arange(block * count) * length // (block * count)
+
+def tile_blocks(pixels, new_width, new_height):
+    """
+    Crop (or, for small reductions, stretch) the source so one block per output pixel tiles it
+
+    Args:
+        pixels: Array of shape (height, width) or (height, width, channels)
+        new_width, new_height: Output grid size
+
+    Returns:
+        (pixels, block_h, block_w) with pixels of shape
+        (new_height * block_h, new_width * block_w, channels)
+    """
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    height, width = pixels.shape[:2]
+    block_h, rows = _block_layout(height, new_height)
+    block_w, cols = _block_layout(width, new_width)
+    return pixels[rows][:, cols], block_h, block_w
+
+def _block_sum(pixels, block_h, block_w, peak):
+    """Sum of each block, accumulated in an integer type wide enough for block_h * block_w * peak"""
+    height, width, channels = pixels.shape
+    new_height, new_width = height // block_h, width // block_w
+    dtype = np.uint32 if block_h * block_w * peak < 2 ** 32 else np.uint64
+    # Rows first while each block's pixels are still contiguous, then columns
+    rows = pixels.reshape(new_height, block_h, width * channels).sum(axis=1, dtype=dtype)
+    return rows.reshape(new_height, new_width, block_w, channels).sum(axis=2)
+
+def _box_linear(pixels, block_h, block_w):
+    """Area average in linear light"""
+    linear = _SRGB_TO_LINEAR_16[pixels]
+    return linear_to_srgb(_block_sum(linear, block_h, block_w, 65535) / (block_h * block_w * 65535.0))
+
+def _block_mode(pixels, block_h, block_w):
+    """Most frequent color in each block (ties go to the lowest packed RGB value)"""
+    height, width, channels = pixels.shape
+    new_height, new_width = height // block_h, width // block_w
+    packed = np.zeros((height, width), dtype=np.uint32)
+    for channel in range(channels):
+        packed = (packed << 8) | pixels[..., channel]
+    blocks = packed.reshape(new_height, block_h, new_width, block_w).transpose(0, 2, 1, 3)
+    ordered = np.sort(blocks.reshape(-1, block_h * block_w), axis=-1).ravel()
+
+    # Runs of equal values, split at block boundaries
+    size = block_h * block_w
+    run_starts = np.ones(ordered.shape, dtype=bool)
+    run_starts[1:] = ordered[1:] != ordered[:-1]
+    run_starts[::size] = True
+    starts = np.flatnonzero(run_starts)
+    lengths = np.diff(np.append(starts, ordered.size))
+
+    # First (lowest valued) longest run of each block
+    block_runs = np.flatnonzero(starts % size == 0)
+    longest = np.maximum.reduceat(lengths, block_runs)
+    run_block = np.repeat(np.arange(block_runs.size), np.diff(np.append(block_runs, starts.size)))
+    candidates = np.where(lengths == longest[run_block], np.arange(starts.size), starts.size)
+    best = ordered[starts[np.minimum.reduceat(candidates, block_runs)]].reshape(new_height, new_width)
+
+    shifts = [8 * (channels - 1 - c) for c in range(channels)]
+    return np.stack([(best >> shift) & 0xFF for shift in shifts], axis=-1).astype(np.uint8)
+
+def _block_median(pixels, block_h, block_w):
+    """Per-channel median of each block"""
+    height, width, channels = pixels.shape
+    new_height, new_width = height // block_h, width // block_w
+    size = block_h * block_w
+    blocks = pixels.reshape(new_height, block_h, new_width, block_w, channels).transpose(4, 0, 2, 1, 3)
+    # A stable sort of uint8 is a radix sort, much faster than np.median's partition
+    ordered = np.sort(blocks.reshape(channels, new_height, new_width, size), axis=-1, kind='stable')
+    low = ordered[..., (size - 1) // 2].astype(np.uint16)
+    high = ordered[..., size // 2]
+    return np.rint((low + high) / 2).astype(np.uint8).transpose(1, 2, 0)
+
+_BLOCK_KERNELS = {
+    'box': _box_linear,
+    'mode': _block_mode,
+    'median': _block_median,
+}
+
+def downscale_image(image, size, method='lanczos'):
+    """
+    Downscale a PIL image to the given size with the selected kernel
+
+    Args:
+        image: PIL image in RGB or L mode
+        size: Target (width, height)
+        method: One of DOWNSCALE_METHODS
+
+    Returns:
+        Resized PIL image (the input itself if it is already that size)
+    """
+    if method not in DOWNSCALE_METHODS:
+        raise ValueError(f"Unknown downscale method: {method}")
+    if image.size == tuple(size):
+        return image
+    if method == 'lanczos':
+        return image.resize(size, Image.Resampling.LANCZOS)
+
+    pixels = np.asarray(image)
+    result = _BLOCK_KERNELS[method](*tile_blocks(pixels, size[0], size[1]))
+    if pixels.ndim == 2:
+        result = result[..., 0]
+    return Image.fromarray(result)
+
+def downscale_alpha(alpha, size, method='lanczos'):
+    """
+    Downscale an alpha channel ('L' image) with the selected kernel
+
+    Alpha is already linear, so 'box' takes a plain block mean instead of going
+    through the sRGB transfer curve.
+    """
+    if method == 'box' and alpha.size != tuple(size):
+        pixels, block_h, block_w = tile_blocks(np.asarray(alpha), size[0], size[1])
+        sums = _block_sum(pixels, block_h, block_w, 255)
+        return Image.fromarray(np.rint(sums / (block_h * block_w))[..., 0].astype(np.uint8))
+    return downscale_image(alpha, size, method)
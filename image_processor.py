@@ -1,15 +1,108 @@
 import os
+import io
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageFont, ImageSequence, features
 import json
-from color_palette import find_closest_color, WPLACE_PALETTE, FREE_COLORS, PREMIUM_COLORS
+from downscale import fit_size, downscale_image, downscale_alpha
+from svg_raster import is_svg, rasterize_svg
+from color_palette import compile_palette, select_palette_subset, WPLACE_PALETTE, FREE_COLORS, PREMIUM_COLORS
+from adjustments import AdjustmentPipeline, creates_alpha
+from storage import ShardedStore
+from memory_profile import (
+    MemoryProfiler, MemoryBudgetExceeded, NULL_PROFILER, estimate_conversion_bytes, estimate_animation_bytes,
+    estimate_sweep_bytes
+)
+
+# Alpha cutoff used when background removal is requested without an explicit threshold
+DEFAULT_ALPHA_THRESHOLD = 128
+
+# Number of downscaled sources kept in memory for live previews
+PREVIEW_CACHE_SIZE = 16
+
+# Upload history thumbnails: longest side in pixels, WebP where Pillow supports it
+THUMBNAIL_SIZE = 128
+THUMBNAIL_FORMAT = 'webp' if features.check('webp') else 'png'
+
+# Checkerboard colors for transparent cells in previews
+CHECKER_LIGHT = (255, 255, 255)
+CHECKER_DARK = (204, 204, 204)
+
+# Over the memory budget, JPEGs are decoded at a reduced scale of at least this many source pixels per output cell
+DRAFT_OVERSAMPLE = 4
+
+def flatten_to_rgb(image):
+    """Flatten an image to RGB, compositing transparency onto white"""
+    if image.mode in ['RGBA', 'P']:
+        # Create white background for transparent images
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        return background
+    elif image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+def thumbnail_filename(filename):
+    """Name of the history thumbnail of an upload"""
+    return f"{os.path.splitext(filename)[0]}_thumb.{THUMBNAIL_FORMAT}"
+
+def encode_index_grid(indices, colors, opaque=None):
+    """
+    Encode a palette index grid as a compact JSON-friendly payload for the browser
+    
+    Args:
+        indices: (height, width) array of indices into colors
+        colors: List of hex colors
+        opaque: Optional (height, width) bool mask; False cells become transparent
+    
+    Returns:
+        Dictionary with the palette and the row-major grid as base64-encoded
+        uint8 (uint16 little-endian for palettes of 255+ colors); transparent
+        cells hold the dtype's maximum value
+    """
+    dtype = np.uint8 if len(colors) < 255 else np.dtype('<u2')
+    transparent = int(np.iinfo(dtype).max)
+    grid = np.asarray(indices).astype(dtype)
+    if opaque is not None:
+        grid = np.where(opaque, grid, transparent).astype(dtype)
+    height, width = grid.shape
+    return {
+        'width': width,
+        'height': height,
+        'palette': list(colors),
+        'dtype': 'uint8' if dtype == np.uint8 else 'uint16',
+        'transparent': transparent,
+        'grid': base64.b64encode(grid.tobytes()).decode('ascii')
+    }
+
+def _downscale_frame(args):
+    """Process pool worker: downscale one decoded frame"""
+    pixels, size, downscale = args
+    return np.array(downscale_image(Image.fromarray(pixels), size, downscale))
 
 class ImageProcessor:
-    def __init__(self, upload_folder, processed_folder):
+    def __init__(self, upload_folder, processed_folder, memory_budget=None):
         self.upload_folder = upload_folder
         self.processed_folder = processed_folder
+        self.uploads = ShardedStore(upload_folder)
+        self.processed = ShardedStore(processed_folder)
+        self.raster_cache_folder = os.path.join(processed_folder, 'raster_cache')
+        # Decoded, downscaled sources for live previews (least recently used evicted first)
+        self._source_cache = OrderedDict()
+        self._source_lock = threading.Lock()
+        # Adjustment stages, with intermediate results cached per source
+        self.adjustments = AdjustmentPipeline()
+        # Estimated peak bytes one conversion may use (None for no limit)
+        self.memory_budget = memory_budget
     
-    def process_image(self, filename, pixel_size=4, allowed_colors=None, max_width=128, max_height=128):
+    def process_image(self, filename, pixel_size=4, allowed_colors=None, max_width=128, max_height=128, downscale='lanczos',
+                      alpha_threshold=None, metric='rgb', max_colors=None, adjustments=None, profile=False):
         """
         Process an uploaded image into wplace-compatible pixel art
         
@@ -19,103 +112,134 @@ class ImageProcessor:
             allowed_colors: List of allowed hex colors (None for all colors)
             max_width: Maximum width in pixels for the output
             max_height: Maximum height in pixels for the output
+            downscale: Downscale kernel ('lanczos', 'box', 'mode' or 'median')
+            alpha_threshold: Leave pixels with alpha below this (0-255) out of the plan;
+                None composites transparency onto white as before
+            metric: Color matching metric ('rgb' or 'lab')
+            max_colors: Quantize to the best subset of this many allowed colors (None for no limit)
+            adjustments: Ordered list of adjustment stages applied before quantization
+                (see adjustments.py)
+            profile: Add a per-stage peak memory report to the result ('memory_profile');
+                profiled conversions run one at a time
             
         Returns:
             Dictionary with processing results
         """
         try:
             # Load and prepare the image
-            input_path = os.path.join(self.upload_folder, filename)
-            image = Image.open(input_path)
-            
-            # Convert to RGB if necessary
-            if image.mode in ['RGBA', 'P']:
-                # Create white background for transparent images
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize image to fit within max dimensions while maintaining aspect ratio
-            original_width, original_height = image.size
-            aspect_ratio = original_width / original_height
-            
-            if original_width > max_width or original_height > max_height:
-                if aspect_ratio > 1:  # Wider than tall
-                    new_width = min(max_width, original_width)
-                    new_height = int(new_width / aspect_ratio)
-                else:  # Taller than wide
-                    new_height = min(max_height, original_height)
-                    new_width = int(new_height * aspect_ratio)
-                
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Get pixel data
-            pixel_width, pixel_height = image.size
-            pixels = np.array(image)
-            
-            # Map colors to wplace palette
-            if allowed_colors is None:
-                allowed_colors = WPLACE_PALETTE
-            
-            color_map = []
-            pixel_data = []
+            image = self.load_image(filename, max_width, max_height)
+            return self._convert_image(
+                image, filename, pixel_size=pixel_size, allowed_colors=allowed_colors, max_width=max_width,
+                max_height=max_height, downscale=downscale, alpha_threshold=alpha_threshold, metric=metric,
+                max_colors=max_colors, adjustments=adjustments, profile=profile
+            )
+        except Exception as e:
+            return self._error_result(e)
+    
+    def process_image_bytes(self, data, filename, pixel_size=4, allowed_colors=None, max_width=128, max_height=128,
+                            downscale='lanczos', alpha_threshold=None, metric='rgb', max_colors=None,
+                            adjustments=None, profile=False):
+        """
+        Process an image straight from an in-memory buffer, without reading it back from disk
+        
+        Args:
+            data: Raw bytes (or memoryview) of the uploaded image file
+            filename: Name the original will be stored under; used to name the outputs
+            pixel_size, allowed_colors, max_width, max_height, downscale, alpha_threshold, metric, max_colors,
+            adjustments, profile: Same as process_image
             
-            for y in range(pixel_height):
-                row = []
-                for x in range(pixel_width):
-                    # Safely extract RGB values
-                    if len(pixels.shape) == 3:
-                        rgb = tuple(int(val) for val in pixels[y, x])
-                    else:
-                        # Grayscale image
-                        gray_val = int(pixels[y, x])
-                        rgb = (gray_val, gray_val, gray_val)
-                    
-                    # Ensure RGB values are in valid range
-                    rgb = tuple(max(0, min(255, val)) for val in rgb)
-                    
-                    closest_color = find_closest_color(rgb, allowed_colors)
-                    row.append(closest_color)
-                    
-                    # Store pixel data for bot script
-                    pixel_data.append({
-                        'x': x,
-                        'y': y,
-                        'color': closest_color,
-                        'original_rgb': rgb
-                    })
-                color_map.append(row)
-            
-            # Create the processed image (scaled up by pixel_size)
-            output_width = pixel_width * pixel_size
-            output_height = pixel_height * pixel_size
-            output_image = Image.new('RGB', (output_width, output_height))
-            draw = ImageDraw.Draw(output_image)
-            
-            for y in range(pixel_height):
-                for x in range(pixel_width):
-                    color = color_map[y][x]
-                    # Draw pixel block
-                    x1 = x * pixel_size
-                    y1 = y * pixel_size
-                    x2 = x1 + pixel_size
-                    y2 = y1 + pixel_size
-                    draw.rectangle([x1, y1, x2-1, y2-1], fill=color)
+        Returns:
+            Dictionary with processing results
+        """
+        try:
+            if is_svg(filename):
+                image = rasterize_svg(bytes(data), max_width, max_height, self.raster_cache_folder)
+            else:
+                image = Image.open(io.BytesIO(data))
+            return self._convert_image(
+                image, filename, pixel_size=pixel_size, allowed_colors=allowed_colors, max_width=max_width,
+                max_height=max_height, downscale=downscale, alpha_threshold=alpha_threshold, metric=metric,
+                max_colors=max_colors, adjustments=adjustments, profile=profile
+            )
+        except Exception as e:
+            return self._error_result(e)
+    
+    def load_image(self, filename, max_width=128, max_height=128):
+        """
+        Open an uploaded file as a PIL image
+        
+        SVG files are rasterized at the output size, so max dimensions are needed here.
+        """
+        input_path = self.uploads.resolve(filename)
+        if is_svg(filename):
+            with open(input_path, 'rb') as f:
+                return rasterize_svg(f.read(), max_width, max_height, self.raster_cache_folder)
+        return Image.open(input_path)
+    
+    def _convert_image(self, image, filename, profile=False, **options):
+        """Quantize an opened PIL image, profiling the memory of each stage if asked"""
+        if not profile:
+            return self._convert_stages(image, filename, NULL_PROFILER, **options)
+        with MemoryProfiler() as profiler:
+            result = self._convert_stages(image, filename, profiler, **options)
+        result['memory_profile'] = profiler.report()
+        return result
+    
+    def _convert_stages(self, image, filename, profiler, pixel_size=4, allowed_colors=None, max_width=128,
+                        max_height=128, downscale='lanczos', alpha_threshold=None, metric='rgb', max_colors=None,
+                        adjustments=None):
+        """Quantize an opened PIL image and write the processed PNG and pixel JSON"""
+        alpha_threshold = self._effective_alpha_threshold(alpha_threshold, adjustments)
+        original_width, original_height = image.size
+        self._fit_memory_budget(image, max_width, max_height, downscale)
+        with profiler.stage('decode'):
+            pixels, alpha, _ = self._prepare_source(
+                image, max_width, max_height, downscale, alpha_threshold is not None
+            )
+        if adjustments:
+            with profiler.stage('adjust'):
+                source_key = (filename, max_width, max_height, downscale, alpha_threshold is not None)
+                pixels, alpha = self.adjustments.run(source_key, pixels, alpha, adjustments)
+        pixel_height, pixel_width = pixels.shape[:2]
+        with profiler.stage('quantize'):
+            allowed_colors, palette, indices, opaque = self._quantize(
+                pixels, alpha, allowed_colors, alpha_threshold, metric, max_colors
+            )
+        
+        # Store pixel data for bot script
+        with profiler.stage('pixel_data'):
+            pixel_rows = pixels.tolist()
+            index_rows = indices.tolist()
+            ys, xs = np.nonzero(opaque)
+            pixel_data = [
+                {
+                    'x': x,
+                    'y': y,
+                    'color': allowed_colors[index_rows[y][x]],
+                    'original_rgb': pixel_rows[y][x]
+                }
+                for y, x in zip(ys.tolist(), xs.tolist())
+            ]
+            del pixel_rows, index_rows
+        
+        # Create the processed image (scaled up by pixel_size)
+        with profiler.stage('render'):
+            output_image = self._render_blocks(indices, palette.rgb, pixel_size, opaque)
+            output_width, output_height = output_image.size
             
             # Save processed image
             base_name = os.path.splitext(filename)[0]
             output_filename = f"{base_name}_processed_{pixel_size}px.png"
-            output_path = os.path.join(self.processed_folder, output_filename)
-            output_image.save(output_path)
-            
-            # Create pixel data JSON
-            json_filename = f"{base_name}_pixels_{pixel_size}px.json"
-            json_path = os.path.join(self.processed_folder, json_filename)
-            
+            with self.processed.atomic_path(output_filename) as output_path:
+                output_image.save(output_path)
+            del output_image
+        with profiler.stage('thumbnail'):
+            thumbnail = self._save_thumbnail(filename, indices, palette.rgb, opaque)
+        
+        # Create pixel data JSON
+        json_filename = f"{base_name}_pixels_{pixel_size}px.json"
+        
+        with profiler.stage('json'):
             pixel_json = {
                 'original_filename': filename,
                 'dimensions': {
@@ -125,34 +249,350 @@ class ImageProcessor:
                 },
                 'pixel_size': pixel_size,
                 'allowed_colors': allowed_colors,
+                'alpha_threshold': alpha_threshold,
+                'metric': metric,
+                'adjustments': adjustments or [],
+                'transparent_pixels': pixel_width * pixel_height - len(pixel_data),
                 'color_stats': self._get_color_stats(pixel_data),
                 'pixels': pixel_data
             }
             
-            with open(json_path, 'w') as f:
-                json.dump(pixel_json, f, indent=2)
+            with self.processed.atomic_path(json_filename) as json_path:
+                with open(json_path, 'w') as f:
+                    json.dump(pixel_json, f, indent=2)
+        
+        return {
+            'success': True,
+            'original_size': (original_width, original_height),
+            'processed_size': (pixel_width, pixel_height),
+            'output_size': (output_width, output_height),
+            'output_filename': output_filename,
+            'json_filename': json_filename,
+            'thumbnail_filename': thumbnail,
+            'total_pixels': len(pixel_data),
+            'transparent_pixels': pixel_json['transparent_pixels'],
+            'color_stats': pixel_json['color_stats']
+        }
+    
+    def _fit_memory_budget(self, image, max_width, max_height, downscale):
+        """
+        Check a lazily opened image against the memory budget before it is decoded
+        
+        Raises:
+            MemoryBudgetExceeded: If the conversion would exceed the budget
+        """
+        bands = len(image.getbands())
+        self._check_memory_budget(
+            image, max_width, max_height,
+            lambda source_size, output_size: estimate_conversion_bytes(source_size, bands, output_size, downscale)
+        )
+    
+    def fit_sweep_budget(self, image, max_size, workers=None):
+        """
+        Check a lazily opened image against the memory budget of a settings sweep
+        
+        Args:
+            image: Opened, not yet decoded image
+            max_size: Largest candidate size of the sweep
+            workers: Process pool size (None for the number of CPUs)
+        
+        Raises:
+            MemoryBudgetExceeded: If the sweep would exceed the budget
+        """
+        bands = len(image.getbands())
+        workers = workers or os.cpu_count() or 1
+        self._check_memory_budget(
+            image, max_size, max_size,
+            lambda source_size, output_size: estimate_sweep_bytes(source_size, bands, workers)
+        )
+    
+    def _check_memory_budget(self, image, max_width, max_height, estimate):
+        """
+        Compare an estimate for a lazily opened image with the memory budget
+        
+        An oversized JPEG is switched to reduced-scale (DCT) decoding, which
+        never materializes the full-resolution bitmap; anything still over
+        budget is refused.
+        
+        Args:
+            estimate: Callable(source_size, output_size) -> estimated bytes
+        
+        Raises:
+            MemoryBudgetExceeded: If the estimate is over budget
+        """
+        if not self.memory_budget:
+            return
+        output_size = fit_size(image.size[0], image.size[1], max_width, max_height)
+        needed = estimate(image.size, output_size)
+        if needed > self.memory_budget and image.format == 'JPEG':
+            image.draft(image.mode, (output_size[0] * DRAFT_OVERSAMPLE, output_size[1] * DRAFT_OVERSAMPLE))
+            needed = estimate(image.size, output_size)
+        if needed > self.memory_budget:
+            raise MemoryBudgetExceeded(
+                f"Image too large to convert: {image.size[0]}x{image.size[1]} needs about "
+                f"{needed // (1024 * 1024)} MB (limit {self.memory_budget // (1024 * 1024)} MB)"
+            )
+        
+    def _prepare_source(self, image, max_width, max_height, downscale, keep_alpha):
+        """
+        Flatten and downscale an opened image to the output grid
+        
+        Returns:
+            (pixels, alpha, original_size): (height, width, 3) uint8 RGB array,
+            (height, width) uint8 alpha array or None, and the source size
+        """
+        alpha = None
+        if keep_alpha and self._has_alpha(image):
+            alpha = image.convert('RGBA').getchannel('A')
+        image = flatten_to_rgb(image)
+        
+        # Resize image to fit within max dimensions while maintaining aspect ratio
+        original_size = image.size
+        new_size = fit_size(original_size[0], original_size[1], max_width, max_height)
+        pixels = np.array(downscale_image(image, new_size, downscale))
+        if alpha is not None:
+            alpha = np.array(downscale_alpha(alpha, new_size, downscale))
+        return pixels, alpha, original_size
+    
+    def _effective_alpha_threshold(self, alpha_threshold, adjustments):
+        """Background removal only has an effect if transparent pixels are left out"""
+        if alpha_threshold is None and adjustments and creates_alpha(adjustments):
+            return DEFAULT_ALPHA_THRESHOLD
+        return alpha_threshold
+    
+    def _quantize(self, pixels, alpha, allowed_colors, alpha_threshold, metric, max_colors):
+        """
+        Map downscaled pixels to the palette
+        
+        Returns:
+            (allowed_colors, palette, indices, opaque): the colors actually used
+            (after max_colors), their CompiledPalette, the index grid and the
+            opaque mask (transparent pixels are left out of the plan)
+        """
+        if alpha is not None and alpha_threshold is not None:
+            opaque = alpha >= alpha_threshold
+        else:
+            opaque = np.ones(pixels.shape[:2], dtype=bool)
+        
+        # Map colors to wplace palette
+        if allowed_colors is None:
+            allowed_colors = WPLACE_PALETTE
+        if max_colors:
+            allowed_colors = select_palette_subset(pixels[opaque], max_colors, allowed_colors, metric)
+        
+        palette = compile_palette(allowed_colors)
+        indices = palette.match(pixels, metric)
+        return allowed_colors, palette, indices, opaque
+    
+    def preview_grid(self, filename, allowed_colors=None, max_width=128, max_height=128, downscale='lanczos',
+                     alpha_threshold=None, metric='rgb', max_colors=None, adjustments=None):
+        """
+        Quantize an upload in memory and return its index grid, writing nothing to disk
+        
+        The decoded and downscaled source is cached per upload and size, so
+        repeated previews with different palette settings only redo quantization,
+        and changing a late adjustment stage resumes from the cached earlier stages.
+        
+        Returns:
+            Payload from encode_index_grid
+        """
+        alpha_threshold = self._effective_alpha_threshold(alpha_threshold, adjustments)
+        key = (filename, max_width, max_height, downscale, alpha_threshold is not None)
+        with self._source_lock:
+            source = self._source_cache.get(key)
+            if source is not None:
+                self._source_cache.move_to_end(key)
+        
+        if source is None:
+            with self.load_image(filename, max_width, max_height) as image:
+                self._fit_memory_budget(image, max_width, max_height, downscale)
+                source = self._prepare_source(image, max_width, max_height, downscale, alpha_threshold is not None)
+            with self._source_lock:
+                self._source_cache[key] = source
+                while len(self._source_cache) > PREVIEW_CACHE_SIZE:
+                    self._source_cache.popitem(last=False)
+        
+        pixels, alpha, _ = source
+        if adjustments:
+            pixels, alpha = self.adjustments.run(key, pixels, alpha, adjustments)
+        allowed_colors, palette, indices, opaque = self._quantize(
+            pixels, alpha, allowed_colors, alpha_threshold, metric, max_colors
+        )
+        return encode_index_grid(indices, allowed_colors, opaque)
+    
+    def process_animation(self, filename, pixel_size=4, allowed_colors=None, max_width=128, max_height=128,
+                          downscale='lanczos', metric='rgb', max_workers=None):
+        """
+        Process every frame of an animated image (GIF) into a frame-indexed pixel plan
+        
+        Frames identical to the previous one are stored as references instead of
+        being processed again. Unique frames are downscaled across a process pool
+        and mapped through one ColorLUT shared by the whole animation.
+        
+        Args:
+            filename: Name of the uploaded image file
+            pixel_size, allowed_colors, max_width, max_height, downscale, metric: Same as process_image
+            max_workers: Process pool size (None for the number of CPUs)
+            
+        Returns:
+            Dictionary with processing results
+        """
+        try:
+            image = Image.open(self.uploads.resolve(filename))
+            frame_count = getattr(image, 'n_frames', 1)
+            self._check_memory_budget(
+                image, max_width, max_height,
+                lambda frame_size, output_size: estimate_animation_bytes(frame_size, frame_count, output_size)
+            )
+            
+            # Decode frames, skipping those identical to the previous one
+            frames = []
+            unique_frames = []
+            previous_digest = None
+            for frame in ImageSequence.Iterator(image):
+                rgb = np.array(flatten_to_rgb(frame))
+                digest = hashlib.sha1(rgb.tobytes()).hexdigest()
+                duration = frame.info.get('duration', image.info.get('duration', 100))
+                
+                if digest == previous_digest:
+                    frames.append({'duration': duration, 'unique_index': len(unique_frames) - 1, 'duplicate': True})
+                else:
+                    frames.append({'duration': duration, 'unique_index': len(unique_frames), 'duplicate': False})
+                    unique_frames.append(rgb)
+                previous_digest = digest
+            
+            original_height, original_width = unique_frames[0].shape[:2]
+            new_size = fit_size(original_width, original_height, max_width, max_height)
+            
+            # Downscale unique frames in parallel
+            jobs = [(pixels, new_size, downscale) for pixels in unique_frames]
+            if len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    small_frames = list(executor.map(_downscale_frame, jobs))
+            else:
+                small_frames = [_downscale_frame(job) for job in jobs]
+            
+            # Build the color table once from all frames, then map each frame
+            if allowed_colors is None:
+                allowed_colors = WPLACE_PALETTE
+            lut = compile_palette(allowed_colors).lut(metric)
+            lut.add(np.concatenate([pixels.reshape(-1, 3) for pixels in small_frames]))
+            frame_indices = [lut.lookup(pixels) for pixels in small_frames]
+            
+            pixel_width, pixel_height = new_size
+            frame_plans = []
+            preview_frames = []
+            first_frame_of = {}
+            for frame_number, frame in enumerate(frames):
+                unique_index = frame['unique_index']
+                plan = {'index': frame_number, 'duration': frame['duration'], 'same_as': None, 'pixels': []}
+                if frame['duplicate']:
+                    plan['same_as'] = first_frame_of[unique_index]
+                else:
+                    first_frame_of[unique_index] = frame_number
+                    index_rows = frame_indices[unique_index].tolist()
+                    plan['pixels'] = [
+                        {'x': x, 'y': y, 'color': allowed_colors[index_rows[y][x]]}
+                        for y in range(pixel_height)
+                        for x in range(pixel_width)
+                    ]
+                frame_plans.append(plan)
+                preview_frames.append(self._render_blocks(frame_indices[unique_index], lut.palette, pixel_size))
+            
+            base_name = os.path.splitext(filename)[0]
+            thumbnail = self._save_thumbnail(filename, frame_indices[0], lut.palette)
+            
+            # Save animated preview
+            preview_filename = f"{base_name}_animated_{pixel_size}px.gif"
+            with self.processed.atomic_path(preview_filename) as preview_path:
+                preview_frames[0].save(
+                    preview_path,
+                    save_all=True,
+                    append_images=preview_frames[1:],
+                    duration=[frame['duration'] for frame in frames],
+                    loop=0
+                )
+            
+            # Save frame-indexed plan
+            json_filename = f"{base_name}_frames_{pixel_size}px.json"
+            frames_json = {
+                'original_filename': filename,
+                'dimensions': {
+                    'width': pixel_width,
+                    'height': pixel_height,
+                    'frame_count': len(frames),
+                    'unique_frames': len(unique_frames)
+                },
+                'pixel_size': pixel_size,
+                'allowed_colors': allowed_colors,
+                'frames': frame_plans
+            }
+            with self.processed.atomic_path(json_filename) as json_path:
+                with open(json_path, 'w') as f:
+                    json.dump(frames_json, f)
             
             return {
                 'success': True,
                 'original_size': (original_width, original_height),
                 'processed_size': (pixel_width, pixel_height),
-                'output_size': (output_width, output_height),
-                'output_filename': output_filename,
+                'frame_count': len(frames),
+                'unique_frames': len(unique_frames),
                 'json_filename': json_filename,
-                'total_pixels': len(pixel_data),
-                'color_stats': pixel_json['color_stats']
+                'preview_filename': preview_filename,
+                'thumbnail_filename': thumbnail
             }
             
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Image processing error: {e}")
-            print(f"Full traceback: {error_details}")
-            return {
-                'success': False,
-                'error': str(e),
-                'details': error_details
-            }
+            return self._error_result(e)
+    
+    def _has_alpha(self, image):
+        """Check whether an image carries transparency information"""
+        return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    
+    def _render_blocks(self, indices, palette, pixel_size, opaque=None):
+        """
+        Render a palette index grid as an RGB image with pixel_size x pixel_size blocks
+        
+        Cells where opaque is False are drawn as a checkerboard.
+        """
+        blocks = palette[indices].astype(np.uint8)
+        blocks = np.repeat(np.repeat(blocks, pixel_size, axis=0), pixel_size, axis=1)
+        if opaque is not None and not opaque.all():
+            transparent = ~np.repeat(np.repeat(opaque, pixel_size, axis=0), pixel_size, axis=1)
+            blocks[transparent] = self._checkerboard(blocks.shape[1], blocks.shape[0], max(1, pixel_size // 2))[transparent]
+        return Image.fromarray(blocks)
+    
+    def _save_thumbnail(self, filename, indices, palette, opaque=None):
+        """Render a small history thumbnail of a converted grid and return its name"""
+        height, width = indices.shape
+        scale = max(1, THUMBNAIL_SIZE // max(width, height))
+        image = self._render_blocks(indices, palette, scale, opaque)
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.NEAREST)
+        
+        name = thumbnail_filename(filename)
+        with self.processed.atomic_path(name) as path:
+            image.save(path)
+        return name
+    
+    def _checkerboard(self, width, height, square):
+        """RGB checkerboard array used to show transparent cells"""
+        ys, xs = np.indices((height, width))
+        light = ((ys // square + xs // square) % 2 == 0)[..., None]
+        return np.where(light, np.array(CHECKER_LIGHT, dtype=np.uint8), np.array(CHECKER_DARK, dtype=np.uint8))
+    
+    def _error_result(self, e):
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Image processing error: {e}")
+        print(f"Full traceback: {error_details}")
+        result = {
+            'success': False,
+            'error': str(e),
+            'details': error_details
+        }
+        if isinstance(e, MemoryBudgetExceeded):
+            result['budget_exceeded'] = True
+        return result
     
     def _get_color_stats(self, pixel_data):
         """Get statistics about colors used in the pixel art"""
@@ -177,11 +617,33 @@ class ImageProcessor:
             'total_pixels': len(pixel_data)
         }
     
+    def load_index_grid(self, json_filename):
+        """
+        Rebuild the palette index grid of a processed image from its pixel JSON
+        
+        Returns:
+            Payload from encode_index_grid
+        """
+        with open(self.processed.resolve(json_filename), 'r') as f:
+            data = json.load(f)
+        
+        width = data['dimensions']['width']
+        height = data['dimensions']['height']
+        colors = data['allowed_colors']
+        color_index = {color: i for i, color in enumerate(colors)}
+        
+        indices = np.zeros((height, width), dtype=np.intp)
+        opaque = np.zeros((height, width), dtype=bool)
+        for pixel in data['pixels']:
+            indices[pixel['y'], pixel['x']] = color_index[pixel['color']]
+            opaque[pixel['y'], pixel['x']] = True
+        
+        return encode_index_grid(indices, colors, opaque)
+    
     def create_preview_grid(self, json_filename, grid_size=20):
         """Create a small preview grid showing the pixel art"""
         try:
-            json_path = os.path.join(self.processed_folder, json_filename)
-            with open(json_path, 'r') as f:
+            with open(self.processed.resolve(json_filename), 'r') as f:
                 data = json.load(f)
             
             width = data['dimensions']['width']
@@ -199,20 +661,27 @@ class ImageProcessor:
             # Draw preview grid
             for y in range(height):
                 for x in range(width):
-                    color = color_map.get((x, y), '#FFFFFF')
+                    color = color_map.get((x, y))
                     x1 = x * grid_size
                     y1 = y * grid_size
                     x2 = x1 + grid_size
                     y2 = y1 + grid_size
-                    draw.rectangle([x1, y1, x2-1, y2-1], fill=color)
+                    if color is None:
+                        # Transparent cell (not in the plan)
+                        half = grid_size // 2
+                        draw.rectangle([x1, y1, x2-1, y2-1], fill=CHECKER_LIGHT)
+                        draw.rectangle([x1 + half, y1, x2-1, y1 + half - 1], fill=CHECKER_DARK)
+                        draw.rectangle([x1, y1 + half, x1 + half - 1, y2-1], fill=CHECKER_DARK)
+                    else:
+                        draw.rectangle([x1, y1, x2-1, y2-1], fill=color)
                     # Draw grid lines
                     draw.rectangle([x1, y1, x2-1, y2-1], outline='#CCCCCC')
             
             # Save preview
             base_name = os.path.splitext(json_filename)[0]
             preview_filename = f"{base_name}_preview.png"
-            preview_path = os.path.join(self.processed_folder, preview_filename)
-            preview_image.save(preview_path)
+            with self.processed.atomic_path(preview_filename) as preview_path:
+                preview_image.save(preview_path)
             
             return preview_filename
             
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Load test for the conversion endpoints
+Starts gunicorn locally with each worker configuration, drives /upload, /process,
+/api/color-palette and /download with a synthetic image corpus and reports
+latency percentiles, throughput and error rates per endpoint
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+import urllib.request
+import urllib.error
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENDPOINTS = ('upload', 'process', 'color-palette', 'download')
+
+# Worker classes that need an extra package installed
+WORKER_CLASS_PACKAGES = {'gevent': 'gevent', 'eventlet': 'eventlet'}
+
+def build_corpus(count, size, seed=0):
+    """
+    Synthetic source images: gradients, noise and flat shapes, as PNG and JPEG
+
+    Returns:
+        List of (filename, bytes, content_type)
+    """
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        width = int(size * rng.uniform(0.5, 1.0))
+        height = int(size * rng.uniform(0.5, 1.0))
+        ys, xs = np.mgrid[0:height, 0:width]
+        pixels = np.stack([xs * 255 // width, ys * 255 // height, (xs + ys) * 255 // (width + height)], axis=-1)
+        pixels = pixels + rng.normal(0, 12, pixels.shape)
+        for _ in range(4):
+            x0, y0 = rng.integers(0, width // 2), rng.integers(0, height // 2)
+            pixels[y0:y0 + height // 4, x0:x0 + width // 4] = rng.integers(0, 256, 3)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+        buffer = io.BytesIO()
+        if i % 2:
+            image.save(buffer, format='JPEG', quality=90)
+            corpus.append((f"load_{i}.jpg", buffer.getvalue(), 'image/jpeg'))
+        else:
+            image.save(buffer, format='PNG')
+            corpus.append((f"load_{i}.png", buffer.getvalue(), 'image/png'))
+    return corpus
+
+def encode_multipart(field, filename, data, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def send(url, data=None, content_type=None, timeout=60):
+    """
+    Issue one request
+
+    Returns:
+        (status, body bytes); status 0 for connection errors and timeouts
+    """
+    request = urllib.request.Request(url, data=data)
+    if content_type:
+        request.add_header('Content-Type', content_type)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return 0, b''
+
+class LoadClient:
+    """Builds the request for each endpoint against one running server"""
+
+    def __init__(self, base_url, corpus):
+        self.base_url = base_url
+        self.corpus = corpus
+        self.image_ids = []
+        self.processed_files = []
+
+    def seed(self):
+        """Upload and process part of the corpus so /process and /download have targets"""
+        for filename, data, content_type in self.corpus[:4]:
+            status, body = self.upload(filename, data, content_type)
+            if status != 200:
+                raise RuntimeError(f"Seeding upload failed with HTTP {status}: {body[:200]!r}")
+            image_id = json.loads(body)['image_id']
+            status, body = self.process(image_id)
+            if status != 200:
+                raise RuntimeError(f"Seeding process failed with HTTP {status}: {body[:200]!r}")
+            self.image_ids.append(image_id)
+            self.processed_files.append(json.loads(body)['processed_filename'])
+
+    def upload(self, filename, data, content_type):
+        body, multipart_type = encode_multipart('file', filename, data, content_type)
+        return send(f"{self.base_url}/upload", body, multipart_type)
+
+    def process(self, image_id):
+        payload = {'image_id': image_id, 'pixel_size': 4, 'max_width': 64, 'max_height': 64, 'render_preview': False}
+        return send(f"{self.base_url}/process", json.dumps(payload).encode(), 'application/json')
+
+    def request(self, endpoint, rng):
+        if endpoint == 'upload':
+            return self.upload(*rng.choice(self.corpus))
+        if endpoint == 'process':
+            return self.process(rng.choice(self.image_ids))
+        if endpoint == 'color-palette':
+            return send(f"{self.base_url}/api/color-palette")
+        return send(f"{self.base_url}/download/{rng.choice(self.processed_files)}")
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+def run_endpoint(client, endpoint, concurrency, duration):
+    """
+    Hammer one endpoint from `concurrency` threads for `duration` seconds
+
+    Returns:
+        Dictionary with request count, errors, throughput and latency percentiles (ms)
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = client.request(endpoint, rng)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status == 0 or status >= 400:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_rate': len(errors) / len(latencies) if latencies else 0.0,
+        'error_statuses': sorted(set(errors)),
+        'throughput': len(latencies) / wall_time,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+def start_server(worker_class, workers, threads, port, work_dir):
+    """Start gunicorn on main:app with the production flags, isolated in work_dir"""
+    cmd = [
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--worker-class', worker_class,
+        '--timeout', '30',
+        '--keep-alive', '2',
+        '--chdir', work_dir,
+        '--pythonpath', REPO_DIR,
+        '--log-level', 'warning',
+    ]
+    if worker_class == 'gthread':
+        cmd += ['--threads', str(threads)]
+    cmd.append('main:app')
+
+    env = dict(os.environ, SESSION_SECRET='load-test', DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'load_test.db')}")
+    log = open(os.path.join(work_dir, 'gunicorn.log'), 'wb')
+    process = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            log.close()
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}:\n{_log_tail(log.name)}")
+        if send(f"{base_url}/api/color-palette", timeout=2)[0] == 200:
+            return process, base_url
+        time.sleep(0.5)
+    stop_server(process)
+    raise RuntimeError(f"gunicorn did not become ready within 60 s:\n{_log_tail(log.name)}")
+
+def _log_tail(path, lines=15):
+    with open(path, 'rb') as f:
+        return b''.join(f.readlines()[-lines:]).decode('utf-8', 'replace')
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def worker_class_available(worker_class):
+    package = WORKER_CLASS_PACKAGES.get(worker_class)
+    return package is None or importlib.util.find_spec(package) is not None
+
+def run_configuration(worker_class, workers, args, corpus):
+    """Start a server with one worker setup and measure every endpoint against it"""
+    work_dir = tempfile.mkdtemp(prefix='wplace_load_')
+    process = None
+    try:
+        process, base_url = start_server(worker_class, workers, args.threads, args.port, work_dir)
+        client = LoadClient(base_url, corpus)
+        client.seed()
+        return {endpoint: run_endpoint(client, endpoint, args.concurrency, args.duration) for endpoint in args.endpoints}
+    finally:
+        if process:
+            stop_server(process)
+        if args.keep_work_dirs:
+            print(f"   📁 Work dir: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_results(label, results):
+    print(f"\n📊 {label}")
+    print(f"   {'endpoint':<14} {'req':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for endpoint, stats in results.items():
+        errors = f"{stats['error_rate']:.1%}"
+        print(f"   {endpoint:<14} {stats['requests']:>6} {stats['throughput']:>8.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {errors:>8}")
+
+def print_comparison(all_results, endpoints):
+    print("\n🏁 So sánh cấu hình (req/s / p95 ms)")
+    print(f"   {'config':<16}" + ''.join(f" {endpoint:>20}" for endpoint in endpoints))
+    for label, results in all_results.items():
+        cells = ''.join(
+            f" {results[endpoint]['throughput']:>9.1f} / {results[endpoint]['p95_ms']:>7.0f}"
+            for endpoint in endpoints
+        )
+        print(f"   {label:<16}{cells}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the conversion endpoints under gunicorn')
+    parser.add_argument('--worker-classes', nargs='+', default=['sync', 'gthread'])
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gthread worker')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per endpoint')
+    parser.add_argument('--corpus-size', type=int, default=8)
+    parser.add_argument('--image-size', type=int, default=512, help='Longest side of corpus images')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--json', help='Also write all results to this file')
+    parser.add_argument('--keep-work-dirs', action='store_true')
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('gunicorn') is None:
+        print("❌ Gunicorn không tìm thấy!")
+        print("💡 Cài đặt: pip install gunicorn")
+        return 1
+
+    print("🚦 WPlace Bot - Load Test")
+    print("=" * 50)
+    corpus = build_corpus(args.corpus_size, args.image_size)
+    print(f"🖼️  Corpus: {len(corpus)} ảnh, {sum(len(data) for _, data, _ in corpus) // 1024} KB")
+    print(f"🔧 Concurrency: {args.concurrency}, {args.duration:.0f}s mỗi endpoint")
+
+    all_results = {}
+    for worker_class in args.worker_classes:
+        if not worker_class_available(worker_class):
+            print(f"⚠️  Bỏ qua {worker_class}: cần pip install {WORKER_CLASS_PACKAGES[worker_class]}")
+            continue
+        for workers in args.workers:
+            label = f"{worker_class} x{workers}" + (f" ({args.threads}t)" if worker_class == 'gthread' else '')
+            print(f"\n🚀 {label}...")
+            try:
+                results = run_configuration(worker_class, workers, args, corpus)
+            except RuntimeError as e:
+                print(f"❌ {label}: {e}")
+                continue
+            all_results[label] = results
+            print_results(label, results)
+
+    if len(all_results) > 1:
+        print_comparison(all_results, args.endpoints)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\n💾 Kết quả: {args.json}")
+    return 0 if all_results else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
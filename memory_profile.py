@@ -0,0 +1,164 @@
+"""
+Memory accounting for conversions
+A per-stage profiler (tracemalloc for Python/NumPy allocations, sampled RSS for
+everything else, e.g. PIL's decoders) and the estimate behind the
+per-conversion memory budget
+"""
+
+import os
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Interval of the RSS sampling thread while profiling
+RSS_SAMPLE_INTERVAL = 0.005
+
+# Rough per-cell cost of the Python pixel plan: one dict in pixel_data plus its
+# share of the JSON document
+PLAN_BYTES_PER_CELL = 600
+
+# tracemalloc is process-wide, so profiled conversions run one at a time
+_profile_lock = threading.Lock()
+
+class MemoryBudgetExceeded(Exception):
+    """A conversion would need more memory than the configured budget"""
+
+def rss_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def estimate_conversion_bytes(source_size, bands, output_size, downscale):
+    """
+    Estimate the peak memory of converting one image
+
+    Args:
+        source_size: (width, height) of the decoded source
+        bands: Channels of the decoded source (4 for RGBA)
+        output_size: (width, height) of the output grid
+        downscale: Downscale kernel; block kernels copy the source into blocks
+            and 'box' also converts it to float32 linear light
+
+    Returns:
+        Estimated bytes
+    """
+    source_pixels = source_size[0] * source_size[1]
+    # Decoded image + flattened RGB copy + alpha channel
+    total = source_pixels * (bands + 3 + 1)
+    if downscale == 'box':
+        total += source_pixels * 3 * (1 + 4)
+    elif downscale in ('mode', 'median'):
+        total += source_pixels * 3 * 2
+    return total + output_size[0] * output_size[1] * PLAN_BYTES_PER_CELL
+
+def estimate_animation_bytes(frame_size, frames, output_size):
+    """
+    Estimate the peak memory of converting an animation
+
+    Every frame is kept as a full-size RGB array and pickled to the downscaling
+    pool (two more copies while in flight); duplicate frames are only found
+    while decoding, so all frames are assumed unique.
+
+    Args:
+        frame_size: (width, height) of one frame
+        frames: Number of frames
+        output_size: (width, height) of the output grid
+
+    Returns:
+        Estimated bytes
+    """
+    frame_pixels = frame_size[0] * frame_size[1]
+    total = frames * frame_pixels * 3 * 3 + frame_pixels * 4
+    return total + frames * output_size[0] * output_size[1] * PLAN_BYTES_PER_CELL
+
+def estimate_sweep_bytes(source_size, bands, workers):
+    """
+    Estimate the peak memory of a settings sweep
+
+    The flattened source is pickled to every pool worker, so besides the
+    decoded image and its RGB array there is one copy per worker plus the
+    pickle in flight.
+
+    Returns:
+        Estimated bytes
+    """
+    source_pixels = source_size[0] * source_size[1]
+    return source_pixels * (bands + 3 + 3 * (workers + 1))
+
+class MemoryProfiler:
+    """
+    Records peak memory per conversion stage
+
+    Use as a context manager around the whole conversion and wrap each step
+    in stage(name). tracemalloc sees Python and NumPy allocations; the RSS
+    sampler also catches native allocations that tracemalloc cannot see.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self._rss_peak = 0
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        _profile_lock.acquire()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._rss_baseline = rss_bytes()
+        if self._rss_baseline is not None:
+            self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        if self._started_tracing:
+            tracemalloc.stop()
+        _profile_lock.release()
+        return False
+
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._rss_peak = max(self._rss_peak, rss_bytes() or 0)
+
+    @contextmanager
+    def stage(self, name):
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        self._rss_peak = rss_bytes() or 0
+        started = time.perf_counter()
+        yield
+        traced_after, traced_peak = tracemalloc.get_traced_memory()
+        rss_now = rss_bytes() or 0
+        self.stages.append({
+            'stage': name,
+            'seconds': round(time.perf_counter() - started, 4),
+            'traced_peak_bytes': traced_peak - traced_before,
+            'traced_retained_bytes': traced_after - traced_before,
+            'rss_peak_bytes': max(self._rss_peak, rss_now),
+        })
+
+    def report(self):
+        """Stage records plus overall peaks"""
+        return {
+            'stages': self.stages,
+            'traced_peak_bytes': max((stage['traced_peak_bytes'] for stage in self.stages), default=0),
+            'rss_baseline_bytes': self._rss_baseline,
+            'rss_peak_bytes': max((stage['rss_peak_bytes'] for stage in self.stages), default=0),
+        }
+
+class NullProfiler:
+    """Stand-in when profiling is off: stages cost nothing"""
+
+    def stage(self, name):
+        return nullcontext()
+
+NULL_PROFILER = NullProfiler()
@@ -1,5 +1,7 @@
+import json
 from app import db
 from datetime import datetime
+from color_palette import normalize_palette_colors, palette_hash
 
 class ImageUpload(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +16,53 @@ class ImageUpload(db.Model):
     start_y = db.Column(db.Integer, default=0)
     status = db.Column(db.String(50), default='uploaded')
     
+    # Upload history is paged newest first by (upload_time, id)
+    __table_args__ = (db.Index('ix_image_upload_time_id', 'upload_time', 'id'),)
+    
+class Palette(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    colors = db.Column(db.Text, nullable=False)  # JSON list of hex colors
+    content_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def color_list(self):
+        return json.loads(self.colors)
+    
+    def set_colors(self, colors):
+        """Validate and store colors, updating the content hash"""
+        normalized = normalize_palette_colors(colors)
+        self.colors = json.dumps(normalized)
+        self.content_hash = palette_hash(normalized)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'colors': self.color_list(),
+            'content_hash': self.content_hash,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+class ChunkedUpload(db.Model):
+    """An in-progress resumable upload; the staged bytes live in the staging folder"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid hex, used as the upload token
+    original_filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='uploading')  # uploading, finalizing, completed, failed
+    image_id = db.Column(db.Integer, db.ForeignKey('image_upload.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+class UploadDigest(db.Model):
+    """SHA-256 of an uploaded original, so re-uploading the same file reuses its ImageUpload"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('image_upload.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    image = db.relationship('ImageUpload')
+    
 class BotSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     image_id = db.Column(db.Integer, db.ForeignKey('image_upload.id'), nullable=False)
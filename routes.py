@@ -1,37 +1,294 @@
 import os
 import json
 import uuid
-from flask import render_template, request, jsonify, send_from_directory, flash, redirect, url_for
+from datetime import datetime, timedelta
+from flask import render_template, request, jsonify, send_from_directory, send_file, flash, redirect, url_for
 from werkzeug.utils import secure_filename
 from app import app, db
-from models import ImageUpload, BotSession, PixelLog
-from image_processor import ImageProcessor
-from color_palette import create_color_palette_json, FREE_COLORS, PREMIUM_COLORS
+from models import ImageUpload, BotSession, PixelLog, Palette, ChunkedUpload, UploadDigest
+from image_processor import ImageProcessor, flatten_to_rgb, thumbnail_filename
+from color_palette import create_color_palette_json, create_custom_palette_json, invalidate_compiled_palette, WPLACE_PALETTE, FREE_COLORS, PREMIUM_COLORS, COLOR_METRICS
+from downscale import DOWNSCALE_METHODS
+from adjustments import validate_stages
+from storage import StorageCollector, storage_key
+from database import save_row, commit_with_retry
+from chunked_upload import ChunkStaging, ChunkOffsetError, ChunkChecksumError
+from memory_profile import MemoryBudgetExceeded
+from assets import AssetManifest
 from wplace_bot import WPlaceBot, MultiThreadBot
 from multi_account_bot import MultiAccountBot
+from sweep import build_candidates, run_sweep, DEFAULT_SIZES, SWEEP_PALETTES
 import logging
 import threading
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 
 # Initialize image processor
-image_processor = ImageProcessor(app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'])
+image_processor = ImageProcessor(
+    app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'],
+    memory_budget=app.config['CONVERSION_MEMORY_BUDGET']
+)
+
+def _referenced_storage_keys():
+    """Storage keys of every upload still in the database (their files are never collected)"""
+    with app.app_context():
+        return {storage_key(filename) for (filename,) in db.session.query(ImageUpload.filename)}
+
+# Keep uploads and outputs under the disk quota
+storage_collector = StorageCollector(
+    [image_processor.uploads, image_processor.processed],
+    app.config['STORAGE_QUOTA_BYTES'],
+    _referenced_storage_keys,
+    interval=app.config['STORAGE_GC_INTERVAL'],
+    # Every gunicorn worker starts a collector; the lock lets one of them run at a time
+    lock_path=os.path.join(app.config['STAGING_FOLDER'], 'storage_gc.lock')
+)
+storage_collector.start()
+
+# Staging files of resumable uploads
+chunk_staging = ChunkStaging(app.config['STAGING_FOLDER'])
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg'}
 
+# Upload history page sizes
+RECENT_UPLOADS = 6
+HISTORY_PAGE_SIZE = 24
+HISTORY_MAX_PAGE_SIZE = 100
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def resolve_allowed_colors(palette_id, use_free_only):
+    """
+    Pick the colors for a conversion
+    
+    Returns:
+        (allowed_colors, error): a saved palette's colors, the free colors or
+        None for the full palette; error is set if palette_id does not exist
+    """
+    if palette_id:
+        try:
+            palette = Palette.query.get(int(palette_id))
+        except (TypeError, ValueError):
+            palette = None  # Not an id, so no such palette
+        if not palette:
+            return None, 'Palette not found'
+        return palette.color_list(), None
+    return (FREE_COLORS if use_free_only else None), None
+
+def invalid_choice(field, value, known):
+    """Error message if value is not one of the known names (None if it is)"""
+    if isinstance(value, str) and value in known:
+        return None
+    return f"Unknown {field}: {value!r} (choose from {sorted(known)})"
+
+def check_conversion_methods(downscale, metric):
+    """
+    Check a downscale kernel and color metric before they reach the converter
+    
+    Returns:
+        Error message, or None if both are supported
+    """
+    return invalid_choice('downscale', downscale, DOWNSCALE_METHODS) or invalid_choice('metric', metric, COLOR_METRICS)
+
+def parse_int_setting(value, field, low, high):
+    """
+    Read an optional integer setting and check its range
+    
+    Returns:
+        (value, error): the integer (None if absent) and an error message
+    """
+    if value is None or value == '':
+        return None, None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None, f'{field} must be an integer'
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None, f'{field} must be an integer'
+    if not low <= number <= high:
+        return None, f'{field} must be between {low} and {high}'
+    return number, None
+
+def parse_adjustments(raw):
+    """
+    Read the adjustment stages of a request
+    
+    Args:
+        raw: List of stage dicts, a JSON string of one (form uploads) or None
+    
+    Returns:
+        (stages, error): the validated stage list (None if absent) and an error message
+    """
+    if not raw:
+        return None, None
+    try:
+        stages = json.loads(raw) if isinstance(raw, str) else raw
+        if not isinstance(stages, list):
+            return None, 'Adjustments must be a list of stages'
+        validate_stages(stages)
+    except ValueError as e:
+        return None, str(e)
+    return stages, None
+
+def _history_page(cursor, limit):
+    """
+    One page of upload history, newest first
+    
+    Keyset pagination on the (upload_time, id) index: the cursor is the
+    position of the last row of the previous page, so every page is an index
+    range scan no matter how deep into the history it is.
+    
+    Returns:
+        (uploads, next_cursor): next_cursor is None on the last page
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = ImageUpload.query.order_by(ImageUpload.upload_time.desc(), ImageUpload.id.desc())
+    if cursor:
+        upload_time, upload_id = cursor.rsplit('_', 1)
+        position = (datetime.fromisoformat(upload_time), int(upload_id))
+        query = query.filter(tuple_(ImageUpload.upload_time, ImageUpload.id) < position)
+    
+    uploads = query.limit(limit + 1).all()
+    if len(uploads) <= limit:
+        return uploads, None
+    last = uploads[limit - 1]
+    return uploads[:limit], f"{last.upload_time.isoformat()}_{last.id}"
+
+def _thumbnail_url(upload):
+    """Download URL of an upload's thumbnail, or None if it has none (never converted, or converted before thumbnails)"""
+    name = thumbnail_filename(upload.filename)
+    if image_processor.processed.exists(name):
+        return url_for('download_file', filename=name)
+    return None
+
 @app.route('/')
 def index():
     """Main page with image upload interface"""
-    recent_uploads = ImageUpload.query.order_by(ImageUpload.upload_time.desc()).limit(5).all()
-    return render_template('index.html', recent_uploads=recent_uploads)
+    recent_uploads, next_cursor = _history_page(None, RECENT_UPLOADS)
+    thumbnails = {upload.id: _thumbnail_url(upload) for upload in recent_uploads}
+    return render_template('index.html', recent_uploads=recent_uploads, thumbnails=thumbnails, next_cursor=next_cursor)
+
+@app.route('/api/uploads')
+def list_uploads():
+    """Paginated upload history (pass the returned next_cursor as ?cursor= for the next page)"""
+    limit = max(1, min(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), HISTORY_MAX_PAGE_SIZE))
+    try:
+        uploads, next_cursor = _history_page(request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'success': True,
+        'uploads': [
+            {
+                'id': upload.id,
+                'original_filename': upload.original_filename,
+                'upload_time': upload.upload_time.isoformat(),
+                'status': upload.status,
+                'width': upload.width,
+                'height': upload.height,
+                'pixel_size': upload.pixel_size,
+                'thumbnail_url': _thumbnail_url(upload),
+                'bot_control_url': url_for('bot_control', image_id=upload.id) if upload.status == 'processed' else None
+            }
+            for upload in uploads
+        ],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/api/color-palette')
 def get_color_palette():
-    """Get the wplace color palette data"""
+    """Get the wplace color palette data, or a saved palette with ?palette_id="""
+    palette_id = request.args.get('palette_id', type=int)
+    if palette_id:
+        palette = Palette.query.get(palette_id)
+        if not palette:
+            return jsonify({'error': 'Palette not found'}), 404
+        try:
+            return jsonify(create_custom_palette_json(palette.name, palette.color_list()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     return jsonify(create_color_palette_json())
 
+@app.route('/api/palettes', methods=['GET'])
+def list_palettes():
+    """List saved palettes"""
+    palettes = Palette.query.order_by(Palette.name).all()
+    return jsonify({
+        'success': True,
+        'palettes': [palette.to_dict() for palette in palettes]
+    })
+
+@app.route('/api/palettes', methods=['POST'])
+def create_palette():
+    """Save a new palette"""
+    data = request.get_json()
+    name = (data.get('name') or '').strip()
+    if not name:
+        return jsonify({'error': 'Palette name is required'}), 400
+    
+    try:
+        palette = Palette()
+        palette.name = name
+        palette.set_colors(data.get('colors'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    db.session.add(palette)
+    db.session.commit()
+    return jsonify({'success': True, 'palette': palette.to_dict()}), 201
+
+@app.route('/api/palettes/<int:palette_id>', methods=['GET'])
+def get_palette(palette_id):
+    """Get one saved palette"""
+    palette = Palette.query.get(palette_id)
+    if not palette:
+        return jsonify({'error': 'Palette not found'}), 404
+    return jsonify({'success': True, 'palette': palette.to_dict()})
+
+@app.route('/api/palettes/<int:palette_id>', methods=['PUT'])
+def update_palette(palette_id):
+    """Rename a palette or replace its colors"""
+    palette = Palette.query.get(palette_id)
+    if not palette:
+        return jsonify({'error': 'Palette not found'}), 404
+    
+    data = request.get_json()
+    old_hash = palette.content_hash
+    try:
+        if 'name' in data:
+            name = (data.get('name') or '').strip()
+            if not name:
+                return jsonify({'error': 'Palette name is required'}), 400
+            palette.name = name
+        if 'colors' in data:
+            palette.set_colors(data.get('colors'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    db.session.commit()
+    if palette.content_hash != old_hash:
+        invalidate_compiled_palette(old_hash)
+    return jsonify({'success': True, 'palette': palette.to_dict()})
+
+@app.route('/api/palettes/<int:palette_id>', methods=['DELETE'])
+def delete_palette(palette_id):
+    """Delete a saved palette"""
+    palette = Palette.query.get(palette_id)
+    if not palette:
+        return jsonify({'error': 'Palette not found'}), 404
+    
+    content_hash = palette.content_hash
+    db.session.delete(palette)
+    db.session.commit()
+    invalidate_compiled_palette(content_hash)
+    return jsonify({'success': True, 'message': f'Palette {palette_id} deleted'})
+
 @app.route('/upload', methods=['POST'])
 def upload_image():
     """Handle image upload"""
@@ -52,24 +309,338 @@ def upload_image():
             
         original_filename = secure_filename(file.filename)
         unique_filename = f"{uuid.uuid4()}_{original_filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
+        with image_processor.uploads.atomic_path(unique_filename) as file_path:
+            file.save(file_path)
         
         # Create database record
-        image_upload = ImageUpload()
+        image_upload = save_row(
+            db.session, ImageUpload(),
+            filename=unique_filename,
+            original_filename=original_filename
+        )
+        
+        return jsonify({
+            'success': True,
+            'image_id': image_upload.id,
+            'filename': unique_filename,
+            'original_filename': original_filename
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+def _discard_expired_chunked_uploads():
+    """Drop uploads that were started but not finished within the TTL"""
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['CHUNKED_UPLOAD_TTL'])
+    # A 'finalizing' upload this old belongs to a worker that died mid-finalize
+    expired = ChunkedUpload.query.filter(
+        ChunkedUpload.status.in_(('uploading', 'finalizing', 'failed')), ChunkedUpload.created_at < cutoff
+    ).all()
+    if not expired:
+        return
+    for upload in expired:
+        chunk_staging.release(upload.id)
+    
+    def apply():
+        for upload in expired:
+            db.session.delete(upload)
+    commit_with_retry(db.session, apply)
+
+def _claim_chunked_upload(upload_id):
+    """
+    Move an upload from 'uploading' to 'finalizing' with a conditional UPDATE
+    
+    Returns:
+        True if this request claimed it; False if a concurrent request already did
+    """
+    claimed = False
+    
+    def apply():
+        nonlocal claimed
+        claimed = ChunkedUpload.query.filter_by(id=upload_id, status='uploading').update({'status': 'finalizing'}) == 1
+    commit_with_retry(db.session, apply)
+    return claimed
+
+def _stored_image(digest):
+    """The earlier upload with this SHA-256, if its original is still on disk"""
+    known = UploadDigest.query.get(digest)
+    if known and known.image and image_processor.uploads.exists(known.image.filename):
+        return known.image
+    return None
+
+def _complete_chunked_upload(upload):
+    """
+    Store a fully received upload, or reuse the image of an identical earlier one
+    
+    The staging file is moved into the upload store first, then the
+    ImageUpload, UploadDigest and completed ChunkedUpload rows are committed
+    in one transaction. If another upload of the same bytes commits its digest
+    in between, its image is reused and this copy deleted; any other failure
+    moves the file back to staging, so the upload can be finalized again.
+    
+    Returns:
+        (image_upload, deduplicated)
+    """
+    digest = chunk_staging.digest(upload.id)
+    image_upload = _stored_image(digest)
+    if image_upload:
+        save_row(db.session, upload, status='completed', image_id=image_upload.id)
+        chunk_staging.release(upload.id)
+        return image_upload, True
+    
+    unique_filename = f"{uuid.uuid4()}_{upload.original_filename}"
+    stored_path = image_processor.uploads.path(unique_filename)
+    chunk_staging.release(upload.id, stored_path)
+    
+    image_upload = ImageUpload()
+    
+    def apply():
         image_upload.filename = unique_filename
-        image_upload.original_filename = original_filename
+        image_upload.original_filename = upload.original_filename
         db.session.add(image_upload)
-        db.session.commit()
+        db.session.flush()  # Assigns image_upload.id
+        # A digest row can outlive its file (storage GC); point it at this copy
+        known = UploadDigest.query.get(digest)
+        digest_row = known or UploadDigest(sha256=digest)
+        digest_row.image_id = image_upload.id
+        db.session.add(digest_row)
+        upload.status = 'completed'
+        upload.image_id = image_upload.id
+    
+    try:
+        commit_with_retry(db.session, apply)
+    except Exception as error:
+        db.session.rollback()
+        earlier = _stored_image(digest) if isinstance(error, IntegrityError) else None
+        if earlier is None:
+            chunk_staging.restore(upload.id, stored_path)
+            raise
+        # A concurrent upload of the same bytes committed its digest first
+        image_processor.uploads.delete(unique_filename)
+        save_row(db.session, upload, status='completed', image_id=earlier.id)
+        return earlier, True
+    return image_upload, False
+
+def _chunked_upload_status(upload):
+    return {
+        'success': True,
+        'upload_id': upload.id,
+        'status': upload.status,
+        'received_size': upload.total_size if upload.status == 'completed' else chunk_staging.size(upload.id),
+        'total_size': upload.total_size,
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE'],
+        'image_id': upload.image_id
+    }
+
+@app.route('/api/chunked-uploads', methods=['POST'])
+def init_chunked_upload():
+    """Start a resumable upload; chunks are then sent to /api/chunked-uploads/<id>/chunks"""
+    data = request.get_json()
+    filename = data.get('filename', '')
+    total_size = int(data.get('size', 0))
+    
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed. Please use PNG, JPG, GIF, or SVG.'}), 400
+    if total_size <= 0 or total_size > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': f"File size must be between 1 byte and {app.config['MAX_UPLOAD_SIZE'] // (1024 * 1024)}MB"}), 400
+    
+    _discard_expired_chunked_uploads()
+    
+    upload_id = uuid.uuid4().hex
+    chunk_staging.create(upload_id)
+    upload = save_row(
+        db.session, ChunkedUpload(),
+        id=upload_id,
+        original_filename=secure_filename(filename),
+        total_size=total_size
+    )
+    return jsonify(_chunked_upload_status(upload))
+
+@app.route('/api/chunked-uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """How much of an upload the server has, to resume after a failure"""
+    upload = ChunkedUpload.query.get(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(_chunked_upload_status(upload))
+
+@app.route('/api/chunked-uploads/<upload_id>/chunks', methods=['POST'])
+def append_chunk(upload_id):
+    """
+    Append one chunk (raw request body) at ?offset=
+    
+    The X-Chunk-SHA256 header, if sent, must match the body. A chunk at the
+    wrong offset gets 409 with the offset the server expects.
+    """
+    upload = ChunkedUpload.query.get(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload.status != 'uploading':
+        return jsonify({'error': 'Upload already finalized'}), 409
+    
+    offset = request.args.get('offset', type=int)
+    data = request.get_data()
+    if offset is None or not data:
+        return jsonify({'error': 'Chunk offset and data are required'}), 400
+    if offset + len(data) > upload.total_size:
+        return jsonify({'error': 'Chunk exceeds the declared file size'}), 400
+    
+    try:
+        received_size = chunk_staging.append(upload_id, offset, data, request.headers.get('X-Chunk-SHA256'))
+    except ChunkChecksumError as e:
+        return jsonify({'error': str(e)}), 400
+    except ChunkOffsetError as e:
+        return jsonify({'error': str(e), 'received_size': e.expected}), 409
+    except FileNotFoundError:  # Finalized by a concurrent request
+        return jsonify({'error': 'Upload already finalized'}), 409
+    
+    return jsonify({'success': True, 'received_size': received_size, 'total_size': upload.total_size})
+
+@app.route('/api/chunked-uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """
+    Complete an upload once every byte has arrived
+    
+    If an identical file was uploaded before (same SHA-256) and is still on
+    disk, its existing image is returned instead of storing a second copy.
+    Finalizing is idempotent: a repeated or concurrent request gets the
+    completed upload (or 409 while another request is still finalizing it).
+    """
+    upload = ChunkedUpload.query.get(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    image_upload = None
+    deduplicated = False
+    if upload.status == 'uploading':
+        received_size = chunk_staging.size(upload_id)
+        if received_size != upload.total_size:
+            return jsonify({'error': 'Upload incomplete', 'received_size': received_size}), 409
+        
+        if _claim_chunked_upload(upload_id):
+            try:
+                image_upload, deduplicated = _complete_chunked_upload(upload)
+            except Exception as e:
+                logging.error(f"Finalize upload error: {e}")
+                db.session.rollback()
+                # Retryable only if the staged bytes are still (or back) in staging
+                intact = chunk_staging.size(upload_id) == upload.total_size
+                save_row(db.session, upload, status='uploading' if intact else 'failed')
+                return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+        else:
+            db.session.refresh(upload)
+    
+    if upload.status == 'failed':
+        return jsonify({'error': 'Upload failed, please upload the file again', 'status': upload.status}), 409
+    if upload.status != 'completed':
+        return jsonify({'error': 'Upload is being finalized, retry shortly', 'status': upload.status}), 409
+    if image_upload is None:
+        image_upload = ImageUpload.query.get(upload.image_id)
+    
+    return jsonify({
+        'success': True,
+        'image_id': image_upload.id,
+        'filename': image_upload.filename,
+        'original_filename': image_upload.original_filename,
+        'deduplicated': deduplicated
+    })
+
+@app.route('/upload-and-convert', methods=['POST'])
+def upload_and_convert():
+    """Upload and process an image in one request, decoding it from memory"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file selected'}), 400
+    
+    file = request.files['file']
+    if not file.filename:
+        return jsonify({'error': 'No file selected'}), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'File type not allowed. Please use PNG, JPG, GIF, or SVG.'}), 400
+    
+    pixel_size = int(request.form.get('pixel_size', 4))
+    use_free_only = request.form.get('use_free_only', 'false').lower() in ('1', 'true', 'on')
+    max_width = int(request.form.get('max_width', 64))
+    max_height = int(request.form.get('max_height', 64))
+    downscale = request.form.get('downscale', 'lanczos')
+    metric = request.form.get('metric', 'rgb')
+    error = check_conversion_methods(downscale, metric)
+    if error:
+        return jsonify({'error': error}), 400
+    alpha_threshold, error = parse_int_setting(request.form.get('alpha_threshold'), 'alpha_threshold', 0, 255)
+    if error:
+        return jsonify({'error': error}), 400
+    adjustments, error = parse_adjustments(request.form.get('adjustments'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    allowed_colors, error = resolve_allowed_colors(request.form.get('palette_id'), use_free_only)
+    if error:
+        return jsonify({'error': error}), 404
+    max_colors, error = parse_int_setting(
+        request.form.get('max_colors'), 'max_colors', 1, len(allowed_colors or WPLACE_PALETTE)
+    )
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        original_filename = secure_filename(file.filename)
+        unique_filename = f"{uuid.uuid4()}_{original_filename}"
+        
+        # Decoded straight from memory; the same bytes are stored as the original
+        data = file.read()
+        
+        result = image_processor.process_image_bytes(
+            data,
+            filename=unique_filename,
+            pixel_size=pixel_size,
+            allowed_colors=allowed_colors,
+            max_width=max_width,
+            max_height=max_height,
+            downscale=downscale,
+            alpha_threshold=alpha_threshold,
+            metric=metric,
+            max_colors=max_colors,
+            adjustments=adjustments
+        )
+        
+        if not result['success']:
+            return jsonify({'error': result['error']}), 413 if result.get('budget_exceeded') else 500
+        
+        # Store the original before the row exists, so every request that can
+        # see the image id (live preview, sweep, re-processing) finds the file
+        image_processor.uploads.write_bytes(unique_filename, data)
+        
+        image_upload = save_row(
+            db.session, ImageUpload(),
+            filename=unique_filename,
+            original_filename=original_filename,
+            processed_filename=result['output_filename'],
+            width=result['processed_size'][0],
+            height=result['processed_size'][1],
+            pixel_size=pixel_size,
+            status='processed'
+        )
+        
+        json_filename = result['json_filename']
+        preview_filename = image_processor.create_preview_grid(json_filename)
         
         return jsonify({
             'success': True,
             'image_id': image_upload.id,
             'filename': unique_filename,
-            'original_filename': original_filename
+            'original_filename': original_filename,
+            'processed_filename': result['output_filename'],
+            'json_filename': json_filename,
+            'preview_filename': preview_filename,
+            'dimensions': result['processed_size'],
+            'total_pixels': result['total_pixels'],
+            'transparent_pixels': result['transparent_pixels'],
+            'color_stats': result['color_stats']
         })
         
     except Exception as e:
+        logging.error(f"Upload and convert error: {e}")
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 @app.route('/process', methods=['POST'])
@@ -81,41 +652,67 @@ def process_image():
     use_free_only = data.get('use_free_only', False)
     max_width = int(data.get('max_width', 64))
     max_height = int(data.get('max_height', 64))
+    downscale = data.get('downscale', 'lanczos')
+    metric = data.get('metric', 'rgb')
+    error = check_conversion_methods(downscale, metric)
+    if error:
+        return jsonify({'error': error}), 400
+    alpha_threshold, error = parse_int_setting(data.get('alpha_threshold'), 'alpha_threshold', 0, 255)
+    if error:
+        return jsonify({'error': error}), 400
+    adjustments, error = parse_adjustments(data.get('adjustments'))
+    if error:
+        return jsonify({'error': error}), 400
     
     # Get image record
     image_upload = ImageUpload.query.get(image_id)
     if not image_upload:
         return jsonify({'error': 'Image not found'}), 404
     
+    # Determine allowed colors
+    allowed_colors, error = resolve_allowed_colors(data.get('palette_id'), use_free_only)
+    if error:
+        return jsonify({'error': error}), 404
+    max_colors, error = parse_int_setting(data.get('max_colors'), 'max_colors', 1, len(allowed_colors or WPLACE_PALETTE))
+    if error:
+        return jsonify({'error': error}), 400
+    
     try:
-        # Determine allowed colors
-        allowed_colors = FREE_COLORS if use_free_only else None
-        
         # Process the image
         result = image_processor.process_image(
             filename=image_upload.filename,
             pixel_size=pixel_size,
             allowed_colors=allowed_colors,
             max_width=max_width,
-            max_height=max_height
+            max_height=max_height,
+            downscale=downscale,
+            alpha_threshold=alpha_threshold,
+            metric=metric,
+            max_colors=max_colors,
+            adjustments=adjustments,
+            profile=bool(data.get('profile', False))
         )
         
         if not result['success']:
-            return jsonify({'error': result['error']}), 500
+            return jsonify({'error': result['error']}), 413 if result.get('budget_exceeded') else 500
         
         # Update database record
-        image_upload.processed_filename = result['output_filename']
-        image_upload.width = result['processed_size'][0]
-        image_upload.height = result['processed_size'][1]
-        image_upload.pixel_size = pixel_size
-        image_upload.status = 'processed'
-        db.session.commit()
+        save_row(
+            db.session, image_upload,
+            processed_filename=result['output_filename'],
+            width=result['processed_size'][0],
+            height=result['processed_size'][1],
+            pixel_size=pixel_size,
+            status='processed'
+        )
         
-        # Create preview
+        # Create preview (the web UI renders from /api/plan/<json>/grid instead)
         json_filename = result['json_filename']
-        preview_filename = image_processor.create_preview_grid(json_filename)
+        preview_filename = None
+        if data.get('render_preview', True):
+            preview_filename = image_processor.create_preview_grid(json_filename)
         
-        return jsonify({
+        response = {
             'success': True,
             'image_id': image_id,
             'processed_filename': result['output_filename'],
@@ -123,8 +720,12 @@ def process_image():
             'preview_filename': preview_filename,
             'dimensions': result['processed_size'],
             'total_pixels': result['total_pixels'],
+            'transparent_pixels': result['transparent_pixels'],
             'color_stats': result['color_stats']
-        })
+        }
+        if 'memory_profile' in result:
+            response['memory_profile'] = result['memory_profile']
+        return jsonify(response)
         
     except Exception as e:
         import traceback
@@ -133,6 +734,196 @@ def process_image():
         logging.error(f"Full traceback: {error_details}")
         return jsonify({'error': f'Processing failed: {str(e)}', 'details': error_details}), 500
 
+@app.route('/process-animation', methods=['POST'])
+def process_animation():
+    """Process every frame of an animated upload into a frame-indexed plan"""
+    data = request.get_json()
+    image_id = data.get('image_id')
+    pixel_size = int(data.get('pixel_size', 4))
+    use_free_only = data.get('use_free_only', False)
+    max_width = int(data.get('max_width', 64))
+    max_height = int(data.get('max_height', 64))
+    downscale = data.get('downscale', 'lanczos')
+    metric = data.get('metric', 'rgb')
+    error = check_conversion_methods(downscale, metric)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    image_upload = ImageUpload.query.get(image_id)
+    if not image_upload:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    allowed_colors, error = resolve_allowed_colors(data.get('palette_id'), use_free_only)
+    if error:
+        return jsonify({'error': error}), 404
+    
+    result = image_processor.process_animation(
+        filename=image_upload.filename,
+        pixel_size=pixel_size,
+        allowed_colors=allowed_colors,
+        max_width=max_width,
+        max_height=max_height,
+        downscale=downscale,
+        metric=metric
+    )
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 413 if result.get('budget_exceeded') else 500
+    
+    return jsonify({
+        'success': True,
+        'image_id': image_id,
+        'json_filename': result['json_filename'],
+        'preview_filename': result['preview_filename'],
+        'dimensions': result['processed_size'],
+        'frame_count': result['frame_count'],
+        'unique_frames': result['unique_frames']
+    })
+
+def parse_sweep_settings(data):
+    """
+    Read and validate the candidate settings of a sweep request
+    
+    Returns:
+        (settings, error): dict of sizes, palettes, downscales, metrics and top,
+        or None and an error message
+    """
+    try:
+        sizes = [int(size) for size in data.get('sizes', DEFAULT_SIZES)]
+        top = int(data.get('top', 10))
+    except (TypeError, ValueError):
+        return None, 'sizes and top must be integers'
+    if not sizes or min(sizes) <= 0:
+        return None, 'sizes must be a non-empty list of positive integers'
+    if top <= 0:
+        return None, 'top must be positive'
+    
+    settings = {'sizes': sizes, 'top': top}
+    choices = (
+        ('palettes', ['full', 'free'], SWEEP_PALETTES),
+        ('downscales', list(DOWNSCALE_METHODS), DOWNSCALE_METHODS),
+        ('metrics', list(COLOR_METRICS), COLOR_METRICS),
+    )
+    for field, default, known in choices:
+        values = data.get(field, default)
+        if not isinstance(values, list) or not values:
+            return None, f'{field} must be a non-empty list'
+        for value in values:
+            error = invalid_choice(field, value, known)
+            if error:
+                return None, error
+        settings[field] = values
+    return settings, None
+
+@app.route('/api/sweep', methods=['POST'])
+def sweep_settings():
+    """Convert an upload with many candidate settings and rank the results"""
+    data = request.get_json()
+    image_id = data.get('image_id')
+    settings, error = parse_sweep_settings(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    image_upload = ImageUpload.query.get(image_id)
+    if not image_upload:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    try:
+        # Decode once; every candidate works from this array
+        largest = max(settings['sizes'])
+        image = image_processor.load_image(image_upload.filename, largest, largest)
+        image_processor.fit_sweep_budget(image, largest)
+        pixels = np.array(flatten_to_rgb(image))
+        
+        candidates = build_candidates(
+            settings['sizes'], settings['palettes'], settings['downscales'], settings['metrics']
+        )
+        results = run_sweep(pixels, candidates, top=settings['top'])
+
+        response = {
+            'success': True,
+            'image_id': image_id,
+            'candidates': len(candidates),
+            'results': results
+        }
+        if len(set(settings['palettes'])) > 1:
+            # Error is lower with more colors to choose from, so palettes only rank fairly within themselves
+            response['note'] = 'Larger palettes score lower error at the same settings; compare palette_colors across palettes'
+        return jsonify(response)
+        
+    except MemoryBudgetExceeded as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        logging.error(f"Sweep error: {e}")
+        return jsonify({'error': f'Sweep failed: {str(e)}'}), 500
+
+@app.route('/api/plan/<path:json_filename>/grid')
+def get_plan_grid(json_filename):
+    """Get a processed plan as a palette plus a compact index grid for client-side rendering"""
+    json_filename = secure_filename(json_filename)
+    if not json_filename.endswith('.json'):
+        return jsonify({'error': 'Invalid plan file'}), 400
+    
+    try:
+        payload = image_processor.load_index_grid(json_filename)
+    except FileNotFoundError:
+        return jsonify({'error': 'Plan not found'}), 404
+    
+    payload['success'] = True
+    return jsonify(payload)
+
+@app.route('/api/preview-live', methods=['POST'])
+def preview_live():
+    """Quick in-memory preview for interactive settings; writes nothing to disk or the database"""
+    data = request.get_json()
+    image_id = data.get('image_id')
+    use_free_only = data.get('use_free_only', False)
+    max_width = int(data.get('max_width', 64))
+    max_height = int(data.get('max_height', 64))
+    downscale = data.get('downscale', 'lanczos')
+    metric = data.get('metric', 'rgb')
+    error = check_conversion_methods(downscale, metric)
+    if error:
+        return jsonify({'error': error}), 400
+    alpha_threshold, error = parse_int_setting(data.get('alpha_threshold'), 'alpha_threshold', 0, 255)
+    if error:
+        return jsonify({'error': error}), 400
+    adjustments, error = parse_adjustments(data.get('adjustments'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    image_upload = ImageUpload.query.get(image_id)
+    if not image_upload:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    allowed_colors, error = resolve_allowed_colors(data.get('palette_id'), use_free_only)
+    if error:
+        return jsonify({'error': error}), 404
+    max_colors, error = parse_int_setting(data.get('max_colors'), 'max_colors', 1, len(allowed_colors or WPLACE_PALETTE))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        payload = image_processor.preview_grid(
+            image_upload.filename,
+            allowed_colors=allowed_colors,
+            max_width=max_width,
+            max_height=max_height,
+            downscale=downscale,
+            alpha_threshold=alpha_threshold,
+            metric=metric,
+            max_colors=max_colors,
+            adjustments=adjustments
+        )
+    except MemoryBudgetExceeded as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        logging.error(f"Live preview error: {e}")
+        return jsonify({'error': f'Preview failed: {str(e)}'}), 500
+    
+    payload['success'] = True
+    return jsonify(payload)
+
 @app.route('/bot-control/<int:image_id>')
 def bot_control(image_id):
     """Bot control interface"""
@@ -174,9 +965,7 @@ def start_bot():
         db.session.commit()
         
         # Update image record
-        image_upload.start_x = start_x
-        image_upload.start_y = start_y
-        db.session.commit()
+        save_row(db.session, image_upload, start_x=start_x, start_y=start_y)
         
         # Start bot in background thread
         def run_bot():
@@ -187,7 +976,7 @@ def start_bot():
                 
                 # Get JSON file path
                 json_filename = image_upload.processed_filename.replace('.png', '.json').replace('_processed_', '_pixels_')
-                json_path = os.path.join(app.config['PROCESSED_FOLDER'], json_filename)
+                json_path = image_processor.processed.resolve(json_filename)
                 
                 # Progress callback
                 def progress_callback(progress):
@@ -274,7 +1063,7 @@ def generate_script():
     try:
         # Get JSON file path
         json_filename = image_upload.processed_filename.replace('.png', '.json').replace('_processed_', '_pixels_')
-        json_path = os.path.join(app.config['PROCESSED_FOLDER'], json_filename)
+        json_path = image_processor.processed.resolve(json_filename)
         
         # Generate script (use appropriate bot type)
         if thread_count > 1:
@@ -305,15 +1094,32 @@ def generate_script():
 @app.route('/download/<path:filename>')
 def download_file(filename):
     """Download processed files"""
-    # Determine which folder to serve from
-    if filename.endswith('_processed.png') or filename.endswith('_preview.png'):
-        return send_from_directory(app.config['PROCESSED_FOLDER'], filename)
-    elif filename.endswith('.json'):
-        return send_from_directory(app.config['PROCESSED_FOLDER'], filename)
-    elif filename.endswith('.py'):
+    if filename.endswith('.py'):
         return send_from_directory(app.config['SCRIPTS_FOLDER'], filename)
-    else:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    
+    # Processed outputs first, then originals (sharded or legacy flat layout)
+    for store in (image_processor.processed, image_processor.uploads):
+        try:
+            path = store.locate(filename)
+        except ValueError:
+            break
+        if path:
+            store.touch(filename)
+            return send_file(os.path.abspath(path))
+    return jsonify({'error': 'File not found'}), 404
+
+# Fingerprinted, precompressed JS/CSS written by build_assets.py
+asset_manifest = AssetManifest(app.static_folder)
+
+@app.context_processor
+def inject_asset_url():
+    """asset_url('js/main.js') in templates: the built copy if there is one, else the plain static file"""
+    return {'asset_url': lambda filename: asset_manifest.url(filename, 'dist_asset')}
+
+@app.route('/assets/<path:filename>')
+def dist_asset(filename):
+    """Serve a fingerprinted asset with immutable cache headers"""
+    return asset_manifest.send(filename)
 
 @app.errorhandler(404)
 def not_found(error):
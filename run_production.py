@@ -42,6 +42,11 @@ def main():
     for folder in folders:
         os.makedirs(folder, exist_ok=True)
     
+    # Minified, fingerprinted JS/CSS (served with immutable cache headers)
+    from build_assets import build
+    manifest = build()
+    print(f"📦 Static assets: {len(manifest)} files đã build")
+    
     # Production settings
     workers = os.cpu_count() or 1
     port = int(os.environ.get('PORT', 5000))
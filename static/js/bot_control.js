@@ -0,0 +1,345 @@
+// WPlace Bot control page JavaScript
+
+let currentSessionId = null;
+let statusInterval = null;
+let accountStats = { total_accounts: 0, accounts: [] };
+
+// Bot mode change handler
+document.getElementById('bot-mode').addEventListener('change', function() {
+    const mode = this.value;
+    const threadSection = document.getElementById('thread-count-section');
+    const accountSection = document.getElementById('account-count-section');
+    const timeEstimates = document.getElementById('time-estimates');
+    const accountEstimates = document.getElementById('account-estimates');
+    
+    if (mode === 'multi-account') {
+        threadSection.style.display = 'none';
+        accountSection.style.display = 'block';
+        timeEstimates.style.display = 'none';
+        accountEstimates.style.display = 'block';
+        loadAccountStats();
+    } else {
+        threadSection.style.display = 'block';
+        accountSection.style.display = 'none';
+        timeEstimates.style.display = 'block';
+        accountEstimates.style.display = 'none';
+    }
+});
+
+// Manage accounts link
+document.getElementById('manage-accounts-link').addEventListener('click', function(e) {
+    e.preventDefault();
+    const modal = new bootstrap.Modal(document.getElementById('accountModal'));
+    modal.show();
+    loadAccountsList();
+});
+
+// Start bot
+document.getElementById('start-bot-btn').addEventListener('click', function() {
+    const imageId = this.dataset.imageId;
+    const startX = document.getElementById('start-x').value;
+    const startY = document.getElementById('start-y').value;
+    const headless = document.getElementById('headless-mode').checked;
+    const botMode = document.getElementById('bot-mode').value;
+    const threadCount = document.getElementById('thread-count').value;
+
+    const payload = {
+        image_id: imageId,
+        start_x: startX,
+        start_y: startY,
+        headless: headless,
+        bot_mode: botMode
+    };
+
+    if (botMode === 'multi-account') {
+        payload.multi_account = true;
+    } else {
+        payload.thread_count = threadCount;
+    }
+
+    fetch('/api/bot/start', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(payload)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            currentSessionId = data.session_id;
+            document.getElementById('start-bot-btn').style.display = 'none';
+            document.getElementById('stop-bot-btn').style.display = 'inline-block';
+            document.getElementById('bot-status-card').style.display = 'block';
+            
+            // Start monitoring status
+            statusInterval = setInterval(updateBotStatus, 2000);
+            updateBotStatus();
+        } else {
+            alert('Lỗi: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Có lỗi xảy ra khi khởi động bot');
+    });
+});
+
+// Update bot status
+function updateBotStatus() {
+    if (!currentSessionId) return;
+
+    fetch(`/api/bot/status/${currentSessionId}`)
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById('bot-status').textContent = data.status;
+        document.getElementById('bot-status').className = `badge ${getStatusBadgeClass(data.status)}`;
+        
+        const progress = Math.round(data.progress);
+        document.getElementById('bot-progress').textContent = progress + '%';
+        document.getElementById('progress-bar').style.width = progress + '%';
+        document.getElementById('pixels-placed').textContent = data.pixels_placed;
+
+        // Calculate ETA
+        if (data.status === 'running' && data.progress > 0) {
+            const remainingPixels = data.total_pixels - data.pixels_placed;
+            const etaMinutes = Math.round((remainingPixels * 30) / 60);
+            document.getElementById('eta').textContent = etaMinutes > 60 ? 
+                Math.round(etaMinutes / 60) + ' giờ' : etaMinutes + ' phút';
+        }
+
+        if (data.error_message) {
+            document.getElementById('error-message').textContent = data.error_message;
+            document.getElementById('bot-error').style.display = 'block';
+        }
+
+        // Stop monitoring if completed or failed
+        if (data.status === 'completed' || data.status === 'failed') {
+            clearInterval(statusInterval);
+            document.getElementById('start-bot-btn').style.display = 'inline-block';
+            document.getElementById('stop-bot-btn').style.display = 'none';
+        }
+    })
+    .catch(error => console.error('Status update error:', error));
+}
+
+function getStatusBadgeClass(status) {
+    switch(status) {
+        case 'running': return 'bg-primary';
+        case 'completed': return 'bg-success';
+        case 'failed': return 'bg-danger';
+        default: return 'bg-secondary';
+    }
+}
+
+// Generate script
+document.getElementById('generate-script-btn').addEventListener('click', function() {
+    const imageId = this.dataset.imageId;
+    const startX = document.getElementById('start-x').value;
+    const startY = document.getElementById('start-y').value;
+    const threadCount = document.getElementById('thread-count').value;
+
+    fetch('/api/generate-script', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            image_id: imageId,
+            start_x: startX,
+            start_y: startY,
+            thread_count: threadCount
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            document.getElementById('script-content').textContent = data.script_content;
+            document.getElementById('download-script-btn').onclick = function() {
+                const blob = new Blob([data.script_content], { type: 'text/plain' });
+                const url = window.URL.createObjectURL(blob);
+                const a = document.createElement('a');
+                a.href = url;
+                a.download = data.script_filename;
+                a.click();
+                window.URL.revokeObjectURL(url);
+            };
+            new bootstrap.Modal(document.getElementById('scriptModal')).show();
+        } else {
+            alert('Lỗi: ' + data.error);
+        }
+    });
+});
+
+// Copy script
+document.getElementById('copy-script-btn').addEventListener('click', function() {
+    const scriptContent = document.getElementById('script-content').textContent;
+    navigator.clipboard.writeText(scriptContent).then(function() {
+        this.innerHTML = '<i class="fas fa-check"></i> Đã copy';
+        setTimeout(() => {
+            this.innerHTML = '<i class="fas fa-copy"></i> Copy';
+        }, 2000);
+    }.bind(this));
+});
+
+// Account management functions
+function loadAccountStats() {
+    fetch('/api/accounts/stats')
+    .then(response => response.json())
+    .then(data => {
+        accountStats = data;
+        updateAccountCountSelect();
+    })
+    .catch(error => console.error('Error loading account stats:', error));
+}
+
+function updateAccountCountSelect() {
+    const select = document.getElementById('account-count');
+    select.innerHTML = '';
+    
+    if (accountStats.total_accounts === 0) {
+        select.innerHTML = '<option value="0">Chưa có tài khoản</option>';
+    } else {
+        for (let i = 1; i <= Math.min(accountStats.total_accounts, 4); i++) {
+            const option = document.createElement('option');
+            option.value = i;
+            option.textContent = `${i} tài khoản`;
+            select.appendChild(option);
+        }
+        select.value = Math.min(accountStats.total_accounts, 2);
+    }
+}
+
+function loadAccountsList() {
+    fetch('/api/accounts/list')
+    .then(response => response.json())
+    .then(data => {
+        const accountsList = document.getElementById('accounts-list');
+        
+        if (data.accounts.length === 0) {
+            accountsList.innerHTML = `
+                <div class="text-center text-muted">
+                    <i class="fas fa-user-plus fa-2x"></i>
+                    <p>Chưa có tài khoản nào. Thêm tài khoản đầu tiên ở trên.</p>
+                </div>
+            `;
+            return;
+        }
+
+        let html = '';
+        data.accounts.forEach(account => {
+            const statusBadge = account.is_active ? 
+                '<span class="badge bg-success">Active</span>' : 
+                '<span class="badge bg-secondary">Inactive</span>';
+            
+            const premiumBadge = account.is_premium ? 
+                '<span class="badge bg-warning">Premium</span>' : 
+                '<span class="badge bg-info">Free</span>';
+            
+            html += `
+                <div class="d-flex justify-content-between align-items-center border-bottom py-2">
+                    <div>
+                        <strong>${account.username}</strong>
+                        ${premiumBadge}
+                        ${statusBadge}
+                    </div>
+                    <div>
+                        <button class="btn btn-sm btn-outline-danger" onclick="removeAccount('${account.username}')">
+                            <i class="fas fa-trash"></i>
+                        </button>
+                    </div>
+                </div>
+            `;
+        });
+
+        accountsList.innerHTML = html;
+    })
+    .catch(error => console.error('Error loading accounts:', error));
+}
+
+// Add account
+document.getElementById('add-account-form').addEventListener('submit', function(e) {
+    e.preventDefault();
+    
+    const username = document.getElementById('new-username').value;
+    const password = document.getElementById('new-password').value;
+    const isPremium = document.getElementById('new-premium').checked;
+
+    fetch('/api/accounts/add', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            username: username,
+            password: password,
+            is_premium: isPremium
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            this.reset();
+            loadAccountsList();
+            loadAccountStats();
+        } else {
+            alert('Lỗi: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Có lỗi xảy ra khi thêm tài khoản');
+    });
+});
+
+// Remove account
+function removeAccount(username) {
+    if (confirm(`Xóa tài khoản ${username}?`)) {
+        fetch('/api/accounts/remove', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                username: username
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                loadAccountsList();
+                loadAccountStats();
+            } else {
+                alert('Lỗi: ' + data.error);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Có lỗi xảy ra khi xóa tài khoản');
+        });
+    }
+}
+
+// Test accounts
+document.getElementById('test-accounts-btn').addEventListener('click', function() {
+    this.disabled = true;
+    this.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Testing...';
+    
+    fetch('/api/accounts/test')
+    .then(response => response.json())
+    .then(data => {
+        alert(`Test kết quả: ${data.successful_logins}/${data.total_accounts} tài khoản login thành công`);
+        loadAccountsList();
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Có lỗi xảy ra khi test tài khoản');
+    })
+    .finally(() => {
+        this.disabled = false;
+        this.innerHTML = 'Test Tất Cả';
+    });
+});
+
+// Initialize
+loadAccountStats();
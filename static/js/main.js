@@ -2,11 +2,22 @@
 
 let currentImageId = null;
 let colorPalette = null;
+let currentPlan = null;
+let livePreviewTimer = null;
+let livePreviewSequence = 0;
+
+// Delay before a settings change triggers a live preview (ms)
+const LIVE_PREVIEW_DELAY = 150;
+
+// Files above this size are sent as resumable chunks
+const CHUNKED_UPLOAD_THRESHOLD = 2 * 1024 * 1024;
+const CHUNK_RETRIES = 5;
 
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
     initializeUpload();
     loadColorPalette();
+    loadSavedPalettes();
     setupEventListeners();
 });
 
@@ -51,15 +62,9 @@ function initializeUpload() {
 // Handle file upload
 function handleFileUpload(file) {
     // Validate file type
-    const allowedTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif'];
+    const allowedTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/svg+xml'];
     if (!allowedTypes.includes(file.type)) {
-        alert('Định dạng file không hỗ trợ. Vui lòng sử dụng PNG, JPG, hoặc GIF.');
-        return;
-    }
-
-    // Validate file size (16MB)
-    if (file.size > 16 * 1024 * 1024) {
-        alert('File quá lớn. Kích thước tối đa là 16MB.');
+        alert('Định dạng file không hỗ trợ. Vui lòng sử dụng PNG, JPG, GIF hoặc SVG.');
         return;
     }
 
@@ -68,16 +73,9 @@ function handleFileUpload(file) {
     const progressBar = progressSection.querySelector('.progress-bar');
     progressSection.style.display = 'block';
 
-    // Create FormData
-    const formData = new FormData();
-    formData.append('file', file);
-
-    // Upload
-    fetch('/upload', {
-        method: 'POST',
-        body: formData
-    })
-    .then(response => response.json())
+    // Upload (large files in resumable chunks)
+    const upload = file.size > CHUNKED_UPLOAD_THRESHOLD ? uploadInChunks(file, progressBar) : uploadWhole(file);
+    upload
     .then(data => {
         if (data.success) {
             currentImageId = data.image_id;
@@ -102,13 +100,101 @@ function handleFileUpload(file) {
         console.error('Upload error:', error);
         alert('Lỗi upload: ' + error.message);
         progressSection.style.display = 'none';
+        progressBar.style.width = '100%';
     });
 }
 
+// Single-request upload for small files
+function uploadWhole(file) {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    return fetch('/upload', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json());
+}
+
+// Chunked upload that resumes where the server left off, even after a page reload
+async function uploadInChunks(file, progressBar) {
+    const resumeKey = `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+
+    let status = null;
+    const savedUploadId = localStorage.getItem(resumeKey);
+    if (savedUploadId) {
+        const response = await fetch(`/api/chunked-uploads/${savedUploadId}`);
+        if (response.ok) {
+            status = await response.json();
+        }
+    }
+    if (!status) {
+        const response = await fetch('/api/chunked-uploads', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        status = await response.json();
+        if (!status.success) {
+            throw new Error(status.error);
+        }
+        localStorage.setItem(resumeKey, status.upload_id);
+    }
+
+    let offset = status.received_size;
+    while (status.status !== 'completed' && offset < file.size) {
+        progressBar.style.width = `${Math.round(offset / file.size * 100)}%`;
+        const chunk = file.slice(offset, offset + status.chunk_size);
+        offset = await sendChunk(status.upload_id, offset, chunk);
+    }
+
+    const response = await fetch(`/api/chunked-uploads/${status.upload_id}/finalize`, {method: 'POST'});
+    const data = await response.json();
+    if (data.success) {
+        localStorage.removeItem(resumeKey);
+    }
+    return data;
+}
+
+// Send one chunk with its checksum, retrying with backoff; returns the server's received size
+async function sendChunk(uploadId, offset, chunk) {
+    const body = await chunk.arrayBuffer();
+    const headers = {'Content-Type': 'application/octet-stream'};
+    if (window.crypto && crypto.subtle) {
+        // Web Crypto is only available on HTTPS and localhost
+        const digest = await crypto.subtle.digest('SHA-256', body);
+        headers['X-Chunk-SHA256'] = Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(`/api/chunked-uploads/${uploadId}/chunks?offset=${offset}`, {
+                method: 'POST',
+                headers: headers,
+                body: body
+            });
+            const data = await response.json();
+            // 409 carries the offset the server expects next
+            if (data.received_size !== undefined) {
+                return data.received_size;
+            }
+            throw new Error(data.error);
+        } catch (error) {
+            if (attempt >= CHUNK_RETRIES) {
+                throw new Error(`${error.message} (chọn lại file để tiếp tục upload)`);
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+        }
+    }
+}
+
 // Show processing section
 function showProcessingSection(filename) {
     document.getElementById('processing-section').style.display = 'block';
     document.getElementById('process-btn').disabled = false;
+    scheduleLivePreview();
     
     // Update filename display if needed
     console.log('File uploaded:', filename);
@@ -127,6 +213,33 @@ function setupEventListeners() {
     // Process button
     document.getElementById('process-btn').addEventListener('click', processImage);
 
+    // Adjustment slider labels
+    ['contrast', 'saturation'].forEach(name => {
+        document.getElementById(`${name}-slider`).addEventListener('input', function() {
+            document.getElementById(`${name}-value`).textContent = parseFloat(this.value).toFixed(1);
+        });
+    });
+
+    // Live preview on settings change
+    ['max-size', 'downscale-method', 'free-colors-only', 'skip-transparent', 'max-colors', 'palette-select',
+     'contrast-slider', 'saturation-slider', 'posterize-bits', 'sharpen-image', 'remove-background'].forEach(id => {
+        const element = document.getElementById(id);
+        if (element) {
+            element.addEventListener('input', scheduleLivePreview);
+            element.addEventListener('change', scheduleLivePreview);
+        }
+    });
+
+    // Client-side preview zoom and hover inspection
+    const zoomSlider = document.getElementById('preview-zoom');
+    if (zoomSlider) {
+        zoomSlider.addEventListener('input', renderPlanCanvas);
+    }
+    const processedCanvas = document.getElementById('processed-canvas');
+    if (processedCanvas) {
+        processedCanvas.addEventListener('mousemove', inspectPlanPixel);
+    }
+
     // Bot control button
     const startBotBtn = document.getElementById('start-bot-btn');
     if (startBotBtn) {
@@ -140,6 +253,89 @@ function setupEventListeners() {
     if (downloadBtn) {
         downloadBtn.addEventListener('click', downloadProcessedImage);
     }
+
+    // Upload history pagination
+    const loadMoreBtn = document.getElementById('load-more-uploads');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', loadMoreUploads);
+    }
+}
+
+// Read conversion settings from the form
+function getConversionSettings() {
+    const maxSize = parseInt(document.getElementById('max-size').value);
+    const skipTransparent = document.getElementById('skip-transparent').checked;
+    return {
+        pixel_size: parseInt(document.getElementById('pixel-size').value),
+        max_width: maxSize,
+        max_height: maxSize,
+        use_free_only: document.getElementById('free-colors-only').checked,
+        downscale: document.getElementById('downscale-method').value,
+        alpha_threshold: skipTransparent ? 128 : null,
+        max_colors: parseInt(document.getElementById('max-colors').value) || null,
+        palette_id: document.getElementById('palette-select').value || null,
+        adjustments: getAdjustments()
+    };
+}
+
+// Ordered adjustment stages applied before color matching
+function getAdjustments() {
+    const stages = [];
+    if (document.getElementById('remove-background').checked) {
+        stages.push({op: 'remove_background', tolerance: 32});
+    }
+    const contrast = parseFloat(document.getElementById('contrast-slider').value);
+    if (contrast !== 1) {
+        stages.push({op: 'contrast', value: contrast});
+    }
+    const saturation = parseFloat(document.getElementById('saturation-slider').value);
+    if (saturation !== 1) {
+        stages.push({op: 'saturation', value: saturation});
+    }
+    if (document.getElementById('sharpen-image').checked) {
+        stages.push({op: 'sharpen'});
+    }
+    const posterizeBits = parseInt(document.getElementById('posterize-bits').value);
+    if (posterizeBits) {
+        stages.push({op: 'posterize', bits: posterizeBits});
+    }
+    return stages;
+}
+
+// Debounced live preview while settings change
+function scheduleLivePreview() {
+    if (!currentImageId) return;
+    clearTimeout(livePreviewTimer);
+    livePreviewTimer = setTimeout(requestLivePreview, LIVE_PREVIEW_DELAY);
+}
+
+function requestLivePreview() {
+    const sequence = ++livePreviewSequence;
+
+    fetch('/api/preview-live', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            ...getConversionSettings(),
+            image_id: currentImageId
+        })
+    })
+    .then(response => response.json())
+    .then(plan => {
+        // Ignore responses that arrive after a newer request was sent
+        if (sequence !== livePreviewSequence) return;
+        if (!plan.success) {
+            throw new Error(plan.error);
+        }
+        setCurrentPlan(plan);
+        document.getElementById('preview-dimensions').textContent = `${plan.width}x${plan.height}`;
+        document.getElementById('preview-section').style.display = 'block';
+    })
+    .catch(error => {
+        console.error('Live preview error:', error);
+    });
 }
 
 // Process image
@@ -158,9 +354,7 @@ function processImage() {
     progressSection.style.display = 'block';
 
     // Get settings
-    const pixelSize = parseInt(document.getElementById('pixel-size').value);
-    const maxSize = parseInt(document.getElementById('max-size').value);
-    const freeColorsOnly = document.getElementById('free-colors-only').checked;
+    const settings = getConversionSettings();
 
     // Send processing request
     fetch('/process', {
@@ -169,11 +363,9 @@ function processImage() {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
+            ...settings,
             image_id: currentImageId,
-            pixel_size: pixelSize,
-            max_width: maxSize,
-            max_height: maxSize,
-            use_free_only: freeColorsOnly
+            render_preview: false
         })
     })
     .then(response => response.json())
@@ -199,10 +391,9 @@ function processImage() {
 // Show preview
 function showPreview(data) {
     const previewSection = document.getElementById('preview-section');
-    const processedPreview = document.getElementById('processed-preview');
     
-    // Show processed image
-    processedPreview.src = `/download/${data.processed_filename}`;
+    // Draw processed pixel art from the compact index grid
+    loadPlanGrid(data.json_filename);
     
     // Update stats
     document.getElementById('preview-dimensions').textContent = 
@@ -219,6 +410,124 @@ function showPreview(data) {
     previewSection.scrollIntoView({ behavior: 'smooth' });
 }
 
+// Load a processed plan as palette + index grid and draw it
+function loadPlanGrid(jsonFilename) {
+    fetch(`/api/plan/${encodeURIComponent(jsonFilename)}/grid`)
+    .then(response => response.json())
+    .then(plan => {
+        if (!plan.success) {
+            throw new Error(plan.error);
+        }
+        setCurrentPlan(plan);
+    })
+    .catch(error => {
+        console.error('Error loading plan grid:', error);
+    });
+}
+
+function setCurrentPlan(plan) {
+    plan.indices = decodeIndexGrid(plan);
+    plan.rgb = plan.palette.map(hexToRgb);
+    currentPlan = plan;
+    renderPlanCanvas();
+}
+
+// Decode the base64 index grid into a typed array
+function decodeIndexGrid(plan) {
+    const binary = atob(plan.grid);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return plan.dtype === 'uint16' ? new Uint16Array(bytes.buffer) : bytes;
+}
+
+function hexToRgb(hex) {
+    const value = parseInt(hex.replace('#', ''), 16);
+    return [(value >> 16) & 255, (value >> 8) & 255, value & 255];
+}
+
+// Draw the current plan at the selected zoom, with grid lines when zoomed in
+function renderPlanCanvas() {
+    if (!currentPlan) return;
+
+    const canvas = document.getElementById('processed-canvas');
+    const zoom = parseInt(document.getElementById('preview-zoom').value);
+    const { width, height, indices, rgb, transparent } = currentPlan;
+
+    // Paint one canvas pixel per cell, then scale it up without smoothing
+    const source = document.createElement('canvas');
+    source.width = width;
+    source.height = height;
+    const sourceContext = source.getContext('2d');
+    const imageData = sourceContext.createImageData(width, height);
+    for (let i = 0; i < indices.length; i++) {
+        const index = indices[i];
+        if (index === transparent) continue;
+        const color = rgb[index];
+        imageData.data[i * 4] = color[0];
+        imageData.data[i * 4 + 1] = color[1];
+        imageData.data[i * 4 + 2] = color[2];
+        imageData.data[i * 4 + 3] = 255;
+    }
+    sourceContext.putImageData(imageData, 0, 0);
+
+    canvas.width = width * zoom;
+    canvas.height = height * zoom;
+    const context = canvas.getContext('2d');
+    context.fillStyle = createCheckerPattern(context, Math.max(2, Math.floor(zoom / 2)));
+    context.fillRect(0, 0, canvas.width, canvas.height);
+    context.imageSmoothingEnabled = false;
+    context.drawImage(source, 0, 0, canvas.width, canvas.height);
+
+    if (zoom >= 4) {
+        context.strokeStyle = 'rgba(204, 204, 204, 0.6)';
+        context.lineWidth = 1;
+        context.beginPath();
+        for (let x = 0; x <= width; x++) {
+            context.moveTo(x * zoom + 0.5, 0);
+            context.lineTo(x * zoom + 0.5, canvas.height);
+        }
+        for (let y = 0; y <= height; y++) {
+            context.moveTo(0, y * zoom + 0.5);
+            context.lineTo(canvas.width, y * zoom + 0.5);
+        }
+        context.stroke();
+    }
+}
+
+// Checkerboard fill shown behind transparent cells
+function createCheckerPattern(context, square) {
+    const tile = document.createElement('canvas');
+    tile.width = square * 2;
+    tile.height = square * 2;
+    const tileContext = tile.getContext('2d');
+    tileContext.fillStyle = '#FFFFFF';
+    tileContext.fillRect(0, 0, tile.width, tile.height);
+    tileContext.fillStyle = '#CCCCCC';
+    tileContext.fillRect(square, 0, square, square);
+    tileContext.fillRect(0, square, square, square);
+    return context.createPattern(tile, 'repeat');
+}
+
+// Show coordinates and color of the cell under the cursor
+function inspectPlanPixel(event) {
+    if (!currentPlan) return;
+
+    const zoom = parseInt(document.getElementById('preview-zoom').value);
+    const x = Math.floor(event.offsetX / zoom);
+    const y = Math.floor(event.offsetY / zoom);
+    const inspect = document.getElementById('pixel-inspect');
+    if (x < 0 || y < 0 || x >= currentPlan.width || y >= currentPlan.height) {
+        inspect.textContent = '-';
+        return;
+    }
+
+    const index = currentPlan.indices[y * currentPlan.width + x];
+    const color = index === currentPlan.transparent ? 'trong suốt' : currentPlan.palette[index];
+    inspect.textContent = `(${x}, ${y}) ${color}`;
+}
+
 // Load color palette
 function loadColorPalette() {
     fetch('/api/color-palette')
@@ -232,6 +541,104 @@ function loadColorPalette() {
     });
 }
 
+// Load saved custom palettes into the palette selector
+function loadSavedPalettes() {
+    const paletteSelect = document.getElementById('palette-select');
+    if (!paletteSelect) return;
+
+    fetch('/api/palettes')
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) return;
+        data.palettes.forEach(palette => {
+            const option = document.createElement('option');
+            option.value = palette.id;
+            option.textContent = `${palette.name} (${palette.colors.length} màu)`;
+            paletteSelect.appendChild(option);
+        });
+    })
+    .catch(error => {
+        console.error('Error loading saved palettes:', error);
+    });
+}
+
+// Append the next page of upload history
+function loadMoreUploads() {
+    const button = document.getElementById('load-more-uploads');
+    button.disabled = true;
+
+    fetch(`/api/uploads?cursor=${encodeURIComponent(button.dataset.cursor)}`)
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error);
+        }
+        const history = document.getElementById('upload-history');
+        data.uploads.forEach(upload => history.appendChild(createHistoryCard(upload)));
+
+        if (data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+            button.disabled = false;
+        } else {
+            button.remove();
+        }
+    })
+    .catch(error => {
+        button.disabled = false;
+        showError('Lỗi khi tải lịch sử: ' + error.message);
+    });
+}
+
+function createHistoryCard(upload) {
+    const column = document.createElement('div');
+    column.className = 'col-md-6 col-lg-4 mb-3';
+
+    const card = document.createElement('div');
+    card.className = 'card card-sm';
+    if (upload.thumbnail_url) {
+        const thumbnail = document.createElement('img');
+        thumbnail.src = upload.thumbnail_url;
+        thumbnail.className = 'card-img-top history-thumbnail';
+        thumbnail.loading = 'lazy';
+        thumbnail.alt = upload.original_filename;
+        card.appendChild(thumbnail);
+    }
+
+    const body = document.createElement('div');
+    body.className = 'card-body';
+    const title = document.createElement('h6');
+    title.className = 'card-title';
+    title.textContent = upload.original_filename;
+    const time = document.createElement('p');
+    time.className = 'card-text small text-muted';
+    time.textContent = formatUploadTime(upload.upload_time);
+    body.append(title, time);
+
+    if (upload.bot_control_url) {
+        const link = document.createElement('a');
+        link.href = upload.bot_control_url;
+        link.className = 'btn btn-sm btn-outline-primary';
+        link.innerHTML = '<i class="fas fa-robot"></i> Điều khiển';
+        body.appendChild(link);
+    } else {
+        const badge = document.createElement('span');
+        badge.className = 'badge bg-secondary';
+        badge.textContent = upload.status;
+        body.appendChild(badge);
+    }
+
+    card.appendChild(body);
+    column.appendChild(card);
+    return column;
+}
+
+// Same dd/mm/yyyy HH:MM format as the server-rendered history
+function formatUploadTime(isoTime) {
+    const [date, time] = isoTime.split('T');
+    const [year, month, day] = date.split('-');
+    return `${day}/${month}/${year} ${time.slice(0, 5)}`;
+}
+
 // Display color palette
 function displayColorPalette() {
     if (!colorPalette) return;
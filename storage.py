@@ -0,0 +1,241 @@
+"""
+Sharded file storage for uploads and processed outputs
+Files live under two levels of hash-prefix directories so no single directory
+grows unbounded; writes are atomic and a background collector keeps each store
+under a size quota by evicting the least recently used unreferenced files.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, where the app runs as a single process anyway
+    fcntl = None
+
+# Files younger than this are never collected (conversions write their outputs
+# before the ImageUpload row is committed)
+GC_MIN_AGE = 3600
+
+# Leftover temp files from interrupted writes are removed after this long
+STALE_TEMP_AGE = 3600
+
+TEMP_MARKER = '.tmp-'
+
+def storage_key(name):
+    """
+    Identity a stored file is sharded and referenced by
+
+    Uploads are named '{uuid}_{original}' and every derived output starts with
+    the same prefix, so all files of one upload share a key (and a directory).
+    """
+    return name.split('_', 1)[0]
+
+class ShardedStore:
+    """A directory of files addressed by name, sharded by the hash of their storage key"""
+
+    def __init__(self, root, depth=2):
+        self.root = root
+        self.depth = depth
+        os.makedirs(root, exist_ok=True)
+
+    def _check_name(self, name):
+        if not name or os.path.basename(name) != name or name in ('.', '..'):
+            raise ValueError(f"Invalid stored file name: {name!r}")
+
+    def shard_dir(self, name):
+        """Directory a file belongs in, e.g. root/3f/a2"""
+        digest = hashlib.sha1(storage_key(name).encode('utf-8')).hexdigest()
+        parts = [digest[2 * level:2 * level + 2] for level in range(self.depth)]
+        return os.path.join(self.root, *parts)
+
+    def path(self, name):
+        """Sharded path of a file, whether or not it exists"""
+        self._check_name(name)
+        return os.path.join(self.shard_dir(name), name)
+
+    def locate(self, name):
+        """
+        Find an existing file
+
+        Returns:
+            Its sharded path, its legacy flat path (files written before
+            sharding), or None if it does not exist
+        """
+        path = self.path(name)
+        if os.path.isfile(path):
+            return path
+        legacy_path = os.path.join(self.root, name)
+        if os.path.isfile(legacy_path):
+            return legacy_path
+        return None
+
+    def resolve(self, name):
+        """Path to read a file from (the sharded path if it does not exist, so opening raises as usual)"""
+        return self.locate(name) or self.path(name)
+
+    def exists(self, name):
+        return self.locate(name) is not None
+
+    @contextmanager
+    def atomic_path(self, name):
+        """
+        Write a file through a temporary path that is renamed into place on success
+
+        The temp file keeps the extension, so writers that infer the format
+        from it (PIL) work unchanged. On error the temp file is removed and
+        any existing file is left untouched.
+        """
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        extension = os.path.splitext(name)[1]
+        temp_path = os.path.join(directory, f"{TEMP_MARKER}{uuid.uuid4().hex}{extension}")
+        try:
+            yield temp_path
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def write_bytes(self, name, data):
+        """Atomically write a file's contents"""
+        with self.atomic_path(name) as temp_path:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+        return self.path(name)
+
+    def touch(self, name):
+        """Record an access for LRU eviction (atime is unreliable on relatime/noatime mounts)"""
+        path = self.locate(name)
+        if path:
+            stat = os.stat(path)
+            os.utime(path, (time.time(), stat.st_mtime))
+
+    def delete(self, name):
+        path = self.locate(name)
+        if path:
+            os.remove(path)
+
+    def iter_files(self):
+        """
+        Walk every stored file, sharded or legacy
+
+        Yields:
+            (name, path, stat) tuples
+        """
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    yield filename, path, os.stat(path)
+                except FileNotFoundError:  # Removed while walking
+                    continue
+
+    def collect_garbage(self, quota_bytes, is_referenced, min_age=GC_MIN_AGE):
+        """
+        Delete least recently used files until the store fits within the quota
+
+        Args:
+            quota_bytes: Maximum total size of the store
+            is_referenced: Callable(name) -> bool; referenced files are always kept
+            min_age: Files modified more recently than this many seconds are kept
+
+        Returns:
+            (deleted_files, freed_bytes)
+        """
+        now = time.time()
+        total_size = 0
+        candidates = []
+        deleted_files = 0
+        freed_bytes = 0
+
+        for name, path, stat in self.iter_files():
+            if name.startswith(TEMP_MARKER):
+                if now - stat.st_mtime > STALE_TEMP_AGE:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:  # Collected by another worker
+                        continue
+                    deleted_files += 1
+                    freed_bytes += stat.st_size
+                continue
+            total_size += stat.st_size
+            if now - stat.st_mtime > min_age and not is_referenced(name):
+                candidates.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+        candidates.sort()
+        for _, size, path in candidates:
+            if total_size <= quota_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # Collected by another worker
+                pass
+            total_size -= size
+            deleted_files += 1
+            freed_bytes += size
+
+        return deleted_files, freed_bytes
+
+class StorageCollector(threading.Thread):
+    """Background thread that periodically enforces the quota on a set of stores"""
+
+    def __init__(self, stores, quota_bytes, referenced_keys, interval=600, lock_path=None):
+        """
+        Args:
+            stores: ShardedStore instances sharing the quota equally
+            quota_bytes: Total size budget across all stores
+            referenced_keys: Callable returning the set of storage keys to keep
+            interval: Seconds between collections
+            lock_path: File locked during a collection, so that of several worker
+                processes only one collects at a time (None to always collect)
+        """
+        super().__init__(name='storage-gc', daemon=True)
+        self.stores = stores
+        self.quota_bytes = quota_bytes
+        self.referenced_keys = referenced_keys
+        self.interval = interval
+        self.lock_path = lock_path
+        self._stop_event = threading.Event()
+
+    def collect(self):
+        """Run one collection unless another process is already collecting"""
+        if self.lock_path is None or fcntl is None:
+            self._collect()
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Another worker is collecting
+            try:
+                self._collect()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _collect(self):
+        keys = self.referenced_keys()
+        per_store_quota = self.quota_bytes // len(self.stores)
+        for store in self.stores:
+            deleted_files, freed_bytes = store.collect_garbage(
+                per_store_quota, lambda name: storage_key(name) in keys
+            )
+            if deleted_files:
+                logging.info(f"Storage GC removed {deleted_files} files ({freed_bytes} bytes) from {store.root}")
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.collect()
+            except Exception as e:
+                logging.error(f"Storage GC failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
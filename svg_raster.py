@@ -0,0 +1,105 @@
+"""
+SVG rasterization for vector uploads
+PIL cannot open SVG, so vector files are rendered with cairosvg straight at the
+output grid size instead of rendering a large bitmap and downscaling it
+"""
+
+import os
+import io
+import re
+import hashlib
+import xml.etree.ElementTree as ET
+from PIL import Image
+
+try:
+    import cairosvg
+except ImportError:  # Optional dependency, only needed for SVG uploads
+    cairosvg = None
+
+# Fallback size when an SVG declares neither width/height nor a viewBox
+DEFAULT_SVG_SIZE = (300, 150)
+
+_LENGTH_PATTERN = re.compile(r'^\s*([0-9]*\.?[0-9]+)\s*(px)?\s*$')
+
+def is_svg(filename):
+    """Check whether a filename refers to an SVG file"""
+    return filename.lower().endswith('.svg')
+
+def _parse_length(value):
+    """Parse an absolute SVG length such as '64' or '64px' (percentages are ignored)"""
+    if not value:
+        return None
+    match = _LENGTH_PATTERN.match(value)
+    return float(match.group(1)) if match else None
+
+def svg_intrinsic_size(data):
+    """
+    Read the intrinsic size of an SVG document
+
+    Args:
+        data: SVG file contents as bytes
+
+    Returns:
+        (width, height) tuple of floats
+    """
+    root = ET.fromstring(data)
+    width = _parse_length(root.get('width'))
+    height = _parse_length(root.get('height'))
+
+    view_box = root.get('viewBox')
+    if view_box and (width is None or height is None):
+        parts = [float(part) for part in re.split(r'[\s,]+', view_box.strip())]
+        if len(parts) == 4 and parts[2] > 0 and parts[3] > 0:
+            if width is None and height is None:
+                width, height = parts[2], parts[3]
+            elif width is None:
+                width = height * parts[2] / parts[3]
+            else:
+                height = width * parts[3] / parts[2]
+
+    if not width or not height:
+        return DEFAULT_SVG_SIZE
+    return width, height
+
+def svg_target_size(data, max_width, max_height):
+    """Largest size that fits within max dimensions with the SVG's aspect ratio"""
+    width, height = svg_intrinsic_size(data)
+    scale = min(max_width / width, max_height / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def rasterize_svg(data, max_width, max_height, cache_folder=None):
+    """
+    Render an SVG at the output grid size
+
+    Args:
+        data: SVG file contents as bytes
+        max_width: Maximum width in pixels for the output
+        max_height: Maximum height in pixels for the output
+        cache_folder: Folder for rendered rasters keyed by content hash and size (None to disable)
+
+    Returns:
+        RGBA PIL image
+    """
+    size = svg_target_size(data, max_width, max_height)
+
+    cache_path = None
+    if cache_folder:
+        digest = hashlib.sha256(data).hexdigest()
+        cache_path = os.path.join(cache_folder, f"{digest}_{size[0]}x{size[1]}.png")
+        if os.path.exists(cache_path):
+            with Image.open(cache_path) as cached:
+                return cached.convert('RGBA')
+
+    if cairosvg is None:
+        raise RuntimeError("SVG support requires cairosvg (pip install cairosvg)")
+
+    png_data = cairosvg.svg2png(bytestring=data, output_width=size[0], output_height=size[1])
+
+    if cache_path:
+        os.makedirs(cache_folder, exist_ok=True)
+        temp_path = cache_path + '.part'
+        with open(temp_path, 'wb') as f:
+            f.write(png_data)
+        os.replace(temp_path, cache_path)
+
+    return Image.open(io.BytesIO(png_data)).convert('RGBA')
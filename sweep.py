@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Conversion parameter sweep
+Decodes an image once, converts it with every candidate configuration across a
+process pool and ranks the results by perceptual error
+"""
+
+import io
+import sys
+import base64
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from color_palette import compile_palette, COLOR_METRICS, WPLACE_PALETTE, FREE_COLORS, rgb_to_lab
+from downscale import DOWNSCALE_METHODS, fit_size, downscale_image
+
+# Named palettes a candidate can use
+SWEEP_PALETTES = {
+    'full': WPLACE_PALETTE,
+    'free': FREE_COLORS,
+}
+
+DEFAULT_SIZES = (32, 64, 96, 128)
+THUMBNAIL_SIZE = 96
+
+# Decoded source shared by the pool workers (set once per worker process)
+_source_pixels = None
+
+def _init_worker(pixels):
+    global _source_pixels
+    _source_pixels = pixels
+
+def build_candidates(sizes=DEFAULT_SIZES, palettes=('full', 'free'), downscales=DOWNSCALE_METHODS, metrics=COLOR_METRICS):
+    """Cartesian product of sweep settings as a list of config dicts"""
+    return [
+        {'max_size': size, 'palette': palette, 'downscale': downscale, 'metric': metric}
+        for size, palette, downscale, metric in itertools.product(sizes, palettes, downscales, metrics)
+    ]
+
+def _box_filter(values, window):
+    """Mean over every window x window patch (valid region), via a summed-area table"""
+    table = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    total = table[window:, window:] - table[:-window, window:] - table[window:, :-window] + table[:-window, :-window]
+    return total / (window * window)
+
+def ssim(reference, candidate, window=7):
+    """
+    Mean structural similarity of two RGB images, computed on luma
+
+    Returns:
+        float in [-1, 1], 1 for identical images
+    """
+    weights = np.array([0.299, 0.587, 0.114])
+    x = reference.astype(np.float64) @ weights
+    y = candidate.astype(np.float64) @ weights
+    window = max(1, min(window, x.shape[0], x.shape[1]))
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    mu_x = _box_filter(x, window)
+    mu_y = _box_filter(y, window)
+    var_x = _box_filter(x * x, window) - mu_x ** 2
+    var_y = _box_filter(y * y, window) - mu_y ** 2
+    cov = _box_filter(x * y, window) - mu_x * mu_y
+
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+def mean_delta_e(reference, candidate):
+    """Mean CIE76 color difference between two RGB images"""
+    difference = rgb_to_lab(reference) - rgb_to_lab(candidate)
+    return float(np.sqrt((difference ** 2).sum(axis=-1)).mean())
+
+def _thumbnail(pixels):
+    """Nearest-neighbour enlarged PNG of a small image, as a data URL"""
+    height, width = pixels.shape[:2]
+    scale = max(1, THUMBNAIL_SIZE // max(width, height))
+    image = Image.fromarray(pixels).resize((width * scale, height * scale), Image.Resampling.NEAREST)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def group_candidates(candidates):
+    """Group candidates that share a size and downscale kernel, keeping their order"""
+    groups = {}
+    for config in candidates:
+        groups.setdefault((config['max_size'], config['downscale']), []).append(config)
+    return list(groups.values())
+
+def _score(small, config):
+    """Quantize an already downscaled image with one palette and metric and score the result"""
+    palette = compile_palette(SWEEP_PALETTES[config['palette']])
+    indices = palette.match(small, config['metric'])
+    quantized = palette.rgb[indices].astype(np.uint8)
+
+    return dict(
+        config,
+        dimensions=(small.shape[1], small.shape[0]),
+        palette_colors=len(SWEEP_PALETTES[config['palette']]),
+        unique_colors=int(np.unique(indices).size),
+        mean_delta_e=round(mean_delta_e(small, quantized), 3),
+        ssim=round(ssim(small, quantized), 4),
+        thumbnail=_thumbnail(quantized),
+    )
+
+def evaluate_group(configs):
+    """
+    Downscale the shared source once and score every candidate of a group on it
+
+    Args:
+        configs: Candidates sharing max_size and downscale (see group_candidates)
+
+    Returns:
+        The configs extended with dimensions, palette and unique color counts,
+        scores and a thumbnail
+    """
+    pixels = _source_pixels
+    height, width = pixels.shape[:2]
+    max_size = configs[0]['max_size']
+    size = fit_size(width, height, max_size, max_size)
+    small = np.array(downscale_image(Image.fromarray(pixels), size, configs[0]['downscale']))
+    return [_score(small, config) for config in configs]
+
+def run_sweep(pixels, candidates, max_workers=None, top=None):
+    """
+    Evaluate candidate configurations in parallel and rank them
+
+    The source is downscaled once per (size, kernel) pair rather than once per
+    candidate. Error is measured against the palette's own best match, so a
+    larger palette scores better at the same settings; compare palette_colors
+    when ranking candidates of different palettes.
+
+    Args:
+        pixels: Decoded source as an (height, width, 3) uint8 array
+        candidates: List of config dicts (see build_candidates)
+        max_workers: Process pool size (None for the number of CPUs)
+        top: Only return the best N results (None for all)
+
+    Returns:
+        List of result dicts, best first (lowest mean Delta E, then highest SSIM)
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(pixels,)) as executor:
+        results = [result for group in executor.map(evaluate_group, group_candidates(candidates)) for result in group]
+
+    results.sort(key=lambda result: (result['mean_delta_e'], -result['ssim']))
+    for rank, result in enumerate(results, start=1):
+        result['rank'] = rank
+    return results[:top] if top else results
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the best conversion settings for an image')
+    parser.add_argument('image', help='Path to the source image')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--palettes', nargs='+', choices=sorted(SWEEP_PALETTES), default=['full', 'free'])
+    parser.add_argument('--downscales', nargs='+', choices=DOWNSCALE_METHODS, default=list(DOWNSCALE_METHODS))
+    parser.add_argument('--metrics', nargs='+', choices=COLOR_METRICS, default=list(COLOR_METRICS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    from image_processor import flatten_to_rgb
+    with Image.open(args.image) as image:
+        pixels = np.array(flatten_to_rgb(image))
+
+    candidates = build_candidates(args.sizes, args.palettes, args.downscales, args.metrics)
+    print(f"Sweeping {len(candidates)} configurations for {args.image} ({pixels.shape[1]}x{pixels.shape[0]})")
+
+    results = run_sweep(pixels, candidates, max_workers=args.workers, top=args.top)
+    print(f"{'#':>3}  {'size':>9}  {'palette':<11} {'downscale':<8} {'metric':<6} {'colors':>6}  {'dE':>7}  {'SSIM':>6}")
+    for result in results:
+        size = f"{result['dimensions'][0]}x{result['dimensions'][1]}"
+        palette = f"{result['palette']} ({result['palette_colors']})"
+        print(f"{result['rank']:>3}  {size:>9}  {palette:<11} {result['downscale']:<8} {result['metric']:<6} "
+              f"{result['unique_colors']:>6}  {result['mean_delta_e']:>7.3f}  {result['ssim']:>6.4f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
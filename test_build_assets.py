@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script để kiểm tra minify_js / minify_css trong build_assets.py
+Các trường hợp khó: regex hay phép chia, template literal lồng nhau,
+chuỗi và url() trong CSS. Nếu có node, chạy code gốc và code đã minify
+để so sánh kết quả.
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+
+from build_assets import minify_js, minify_css, STATIC_DIR, ASSETS
+
+# (source, expected minified output)
+JS_CASES = [
+    # '/' after ')' or ']' divides
+    ("var a = (x) / 2 / (y);", "var a = (x) / 2 / (y);\n"),
+    ("var b = arr[0] / 2 / arr[1];", "var b = arr[0] / 2 / arr[1];\n"),
+    ("var c = i++ / 2; s = '/' // note", "var c = i++ / 2; s = '/'\n"),
+    ("var q = total_in / 2 / 1;", "var q = total_in / 2 / 1;\n"),
+    # '/' after an operator, '(' or a keyword starts a regex, copied as it is
+    ("return /a\\/b[/]/g.test(s);", "return /a\\/b[/]/g.test(s);\n"),
+    ("var r = x.split(/\\/\\//);  // split on //", "var r = x.split(/\\/\\//);\n"),
+    ("var re = /[/*]/g; z = 1 /* c */ + 2;", "var re = /[/*]/g; z = 1 + 2;\n"),
+    ("if (ok) {\n  go()\n}\n/re/.test(s)", "if (ok) {\ngo()\n}\n/re/.test(s)\n"),
+    # Template literals: nested ${}, braces and backticks inside expressions
+    ("var t = `a  ${ {b: 1}.b }  c ${`in  ${x}`} d`;", "var t = `a  ${ {b: 1}.b }  c ${`in  ${x}`} d`;\n"),
+    ("var u = `x ${ '}' } // y`;", "var u = `x ${ '}' } // y`;\n"),
+    # Comment markers inside strings are text
+    ("var s = 'http://x' + \"/* no */\";", "var s = 'http://x' + \"/* no */\";\n"),
+    # Line breaks survive for automatic semicolon insertion
+    ("a = b\n  // c\n  + d", "a = b\n+ d\n"),
+]
+
+# Programs whose output must not change when minified (run with node)
+JS_PROGRAMS = [
+    "var x = 10, y = 4, arr = [8, 2], i = 3;\n"
+    "console.log((x) / 2 / (y), arr[0] / 2 / arr[1], i++ / 2, i-- / 3);\n",
+
+    "var s = 'a//b/*c*/d';\n"
+    "console.log(s.split(/\\/\\//), s.replace(/[/*]/g, '-'), typeof /x/);\n",
+
+    "var o = {b: 2}, n = 3;\n"
+    "console.log(`a ${ {b: 1}.b } c ${`inner ${n > 2 ? `deep ${o.b}` : ''}`} d`);\n"
+    "console.log(`brace ${ '}' } // not a comment /* nor this */`);\n",
+
+    "function f(v) {\n"
+    "  return v\n"
+    "    / 2\n"
+    "}\n"
+    "var g = function () { return /=+/.test('==') }\n"
+    "console.log(f(9), g())\n",
+]
+
+# (source, expected minified output)
+CSS_CASES = [
+    ('a::after { content: "a ; { } , b" ; }', 'a::after{content: "a ; { } , b"}\n'),
+    ('i { content: "a\\"b /* c */" }', 'i{content: "a\\"b /* c */"}\n'),
+    ("b { background: url(data:image/svg+xml;charset=utf8,%3Csvg xmlns='http://www.w3.org/2000/svg'%3E) ; }",
+     "b{background: url(data:image/svg+xml;charset=utf8,%3Csvg xmlns='http://www.w3.org/2000/svg'%3E)}\n"),
+    ('c { background: url( "a b.png" ) no-repeat , url(x/*y*/z.png) }',
+     'c{background: url( "a b.png" ) no-repeat,url(x/*y*/z.png)}\n'),
+    ('d > e:not(.f) .g , h { width: calc(100% - 2px) ; }', 'd > e:not(.f) .g,h{width: calc(100% - 2px)}\n'),
+    ('/* top */ @media (max-width: 600px) { j { margin : 0 auto ; } }', '@media (max-width: 600px){j{margin : 0 auto}}\n'),
+]
+
+def find_node():
+    return shutil.which('node') or shutil.which('nodejs')
+
+def run_node(node, source):
+    with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as f:
+        f.write(source)
+    try:
+        result = subprocess.run([node, f.name], capture_output=True, text=True, timeout=30)
+    finally:
+        os.remove(f.name)
+    assert result.returncode == 0, f"node lỗi: {result.stderr.strip()}\n--- code ---\n{source}"
+    return result.stdout
+
+def check_node_syntax(node, source, name):
+    with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as f:
+        f.write(source)
+    try:
+        result = subprocess.run([node, '--check', f.name], capture_output=True, text=True, timeout=30)
+    finally:
+        os.remove(f.name)
+    assert result.returncode == 0, f"{name} sau khi minify không hợp lệ: {result.stderr.strip()}"
+
+def test_minify_js():
+    """Minify JS giữ nguyên regex, phép chia, template literal và chuỗi"""
+    print(f"🧪 Testing minify_js ({len(JS_CASES)} trường hợp)...")
+    for source, expected in JS_CASES:
+        output = minify_js(source)
+        assert output == expected, f"minify_js({source!r})\n  nhận được: {output!r}\n  mong đợi:  {expected!r}"
+        assert minify_js(output) == output, f"minify_js không ổn định với {source!r}"
+    print("✅ minify_js đúng với mọi trường hợp")
+
+def test_minify_css():
+    """Minify CSS giữ nguyên chuỗi và url()"""
+    print(f"🧪 Testing minify_css ({len(CSS_CASES)} trường hợp)...")
+    for source, expected in CSS_CASES:
+        output = minify_css(source)
+        assert output == expected, f"minify_css({source!r})\n  nhận được: {output!r}\n  mong đợi:  {expected!r}"
+        assert minify_css(output) == output, f"minify_css không ổn định với {source!r}"
+    print("✅ minify_css đúng với mọi trường hợp")
+
+def test_round_trip_with_node():
+    """Code gốc và code đã minify in ra cùng kết quả; asset thật vẫn hợp lệ"""
+    node = find_node()
+    if node is None:
+        print("⚠️  Không tìm thấy node, bỏ qua kiểm tra chạy thử")
+        return
+
+    print(f"🧪 Testing round-trip với node ({len(JS_PROGRAMS)} chương trình)...")
+    for program in JS_PROGRAMS:
+        minified = minify_js(program)
+        assert run_node(node, program) == run_node(node, minified), \
+            f"Kết quả khác sau khi minify:\n--- gốc ---\n{program}\n--- minify ---\n{minified}"
+
+    for asset in ASSETS:
+        if asset.endswith('.js'):
+            with open(os.path.join(STATIC_DIR, asset), encoding='utf-8') as f:
+                check_node_syntax(node, minify_js(f.read()), asset)
+    print("✅ Kết quả giống hệt, asset đã minify hợp lệ")
+
+if __name__ == "__main__":
+    try:
+        test_minify_js()
+        test_minify_css()
+        test_round_trip_with_node()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
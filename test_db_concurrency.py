@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script để kiểm tra tranh chấp khóa SQLite giữa nhiều worker
+So sánh cấu hình mặc định với WAL + PRAGMA trong database.py
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import DeclarativeBase, Session
+
+from database import configure_sqlite, save_row
+
+WRITERS = 8           # Gunicorn workers handling /upload and /process
+READERS = 8           # Workers rendering pages that read the history
+WRITES_PER_WORKER = 40
+READ_HOLD = 0.2       # Seconds a page keeps its read transaction open
+
+class Base(DeclarativeBase):
+    pass
+
+class Upload(Base):
+    """Same write pattern as ImageUpload: insert on upload, update after processing"""
+    __tablename__ = 'image_upload'
+    id = Column(Integer, primary_key=True)
+    filename = Column(String(255), nullable=False)
+    status = Column(String(50), default='uploaded')
+    width = Column(Integer)
+    height = Column(Integer)
+    upload_time = Column(DateTime, default=datetime.utcnow)
+
+def make_engine(path, tuned):
+    engine = create_engine(f"sqlite:///{path}")
+    if tuned:
+        configure_sqlite(engine)
+    return engine
+
+def writer(path, tuned, worker_id, results):
+    engine = make_engine(path, tuned)
+    latencies = []
+    errors = 0
+    with Session(engine) as session:
+        for i in range(WRITES_PER_WORKER):
+            start = time.perf_counter()
+            try:
+                if tuned:
+                    upload = save_row(session, Upload(), filename=f"{worker_id}_{i}.png")
+                    save_row(session, upload, status='processed', width=64, height=64)
+                else:
+                    upload = Upload(filename=f"{worker_id}_{i}.png")
+                    session.add(upload)
+                    session.commit()
+                    upload.status = 'processed'
+                    upload.width = upload.height = 64
+                    session.commit()
+            except OperationalError:
+                session.rollback()
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    results.put(('write', latencies, errors))
+
+def reader(path, tuned, stop, results):
+    connection = sqlite3.connect(path, isolation_level=None)
+    if tuned:
+        connection.execute("PRAGMA busy_timeout=5000")
+    reads = 0
+    errors = 0
+    while not stop.is_set():
+        try:
+            connection.execute("BEGIN")
+            connection.execute("SELECT id, filename, status FROM image_upload ORDER BY id DESC LIMIT 24").fetchall()
+            time.sleep(READ_HOLD)
+            connection.execute("COMMIT")
+            reads += 1
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            errors += 1
+    connection.close()
+    results.put(('read', reads, errors))
+
+def run_scenario(tuned):
+    """Run concurrent writers and readers against a fresh database"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'test.db')
+        engine = make_engine(path, tuned)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        readers = [multiprocessing.Process(target=reader, args=(path, tuned, stop, results)) for _ in range(READERS)]
+        writers = [multiprocessing.Process(target=writer, args=(path, tuned, n, results)) for n in range(WRITERS)]
+
+        start = time.perf_counter()
+        for process in readers + writers:
+            process.start()
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for process in readers:
+            process.join()
+
+        latencies, write_errors, reads, read_errors = [], 0, 0, 0
+        for _ in range(READERS + WRITERS):
+            kind, value, errors = results.get()
+            if kind == 'write':
+                latencies.extend(value)
+                write_errors += errors
+            else:
+                reads += value
+                read_errors += errors
+
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'writes_per_second': len(latencies) * 2 / elapsed,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'write_errors': write_errors,
+        'reads': reads,
+        'read_errors': read_errors,
+    }
+
+def test_db_concurrency():
+    """Test WAL + busy_timeout loại bỏ lỗi 'database is locked'"""
+    print(f"🧪 Testing SQLite concurrency ({WRITERS} writers, {READERS} readers)...")
+
+    scenarios = {}
+    for name, tuned in (('Mặc định', False), ('WAL + PRAGMA', True)):
+        stats = run_scenario(tuned)
+        scenarios[name] = stats
+        print(f"📊 {name:<13} ghi/s={stats['writes_per_second']:7.1f}  p95={stats['p95_ms']:7.1f}ms  "
+              f"max={stats['max_ms']:7.1f}ms  lỗi ghi={stats['write_errors']}  "
+              f"đọc={stats['reads']}  lỗi đọc={stats['read_errors']}")
+
+    tuned = scenarios['WAL + PRAGMA']
+    assert tuned['write_errors'] == 0 and tuned['read_errors'] == 0, \
+        f"Vẫn còn lỗi khóa database với WAL: {tuned}"
+
+    print("✅ Không còn lỗi 'database is locked' khi ghi đồng thời")
+
+if __name__ == "__main__":
+    try:
+        test_db_concurrency()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)